@@ -1,30 +1,50 @@
+import multiprocessing
 import os
 import urllib.parse
 from PyQt5.QtGui import QIcon
 from PyQt5.QtWidgets import QApplication
-from ui.main_window import YouTubeDownloader
+from utils.single_instance import SingleInstanceServer, forward_to_running_instance
 import sys
 
+
+def url_from_arguments(argv):
+    """URL passed on the command line or through a streamsaver:// link"""
+    if len(argv) > 1:
+        url_arg = argv[1]
+        if url_arg.startswith('http'):
+            return url_arg
+        elif url_arg.startswith('streamsaver://'):
+            url = url_arg.split('streamsaver://')[1]
+            return urllib.parse.unquote(url)
+    return None
+
+
 if __name__ == "__main__":
+    # Needed by the process pool backend in the frozen executable
+    multiprocessing.freeze_support()
+
+    # Process URL parameters from command line
+    default_url = url_from_arguments(sys.argv)
+
+    # Browser links launch us once per click, let the running window take them
+    if forward_to_running_instance(default_url):
+        sys.exit(0)
+
     app = QApplication(sys.argv)
+    instance_server = SingleInstanceServer()
+    if not instance_server.listen() and forward_to_running_instance(default_url):
+        sys.exit(0)
     
     # Set application icon
     app_icon_path = os.path.join(os.path.dirname(__file__), 'assets', 'logo.png')
     if os.path.exists(app_icon_path):
         app.setWindowIcon(QIcon(app_icon_path))
 
-    # Process URL parameters from command line
-    default_url = None
-    
-    if len(sys.argv) > 1:
-        url_arg = sys.argv[1]
-        if url_arg.startswith('http'):
-            default_url = url_arg
-        elif url_arg.startswith('streamsaver://'):
-            url = url_arg.split('streamsaver://')[1]
-            default_url = urllib.parse.unquote(url)
+    # Imported late, a forwarding launch never needs the UI
+    from ui.main_window import YouTubeDownloader
 
     # Initialize the main window with the URL argument if provided
     window = YouTubeDownloader(default_url=default_url)
+    instance_server.url_received.connect(window.open_url)
     window.show()
     sys.exit(app.exec_())
\ No newline at end of file
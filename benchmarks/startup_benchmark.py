@@ -0,0 +1,104 @@
+"""
+Startup benchmark: time-to-first-paint and time-to-first-fetch.
+
+Every run starts a fresh interpreter, so imports are measured cold (as far
+as the OS file cache allows). Run from the repository root:
+
+    python benchmarks/startup_benchmark.py --runs 5 --url https://youtu.be/...
+
+Without --url only time-to-first-paint is measured. First-fetch times
+include --delay. Use QT_QPA_PLATFORM=offscreen to run without a display.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_child(started_at, url, delay):
+    """One measured startup, reports its timings as JSON on stdout"""
+    sys.path.insert(0, ROOT)
+    from PyQt5.QtCore import QEvent, QObject, QTimer
+    from PyQt5.QtWidgets import QApplication
+
+    app = QApplication(sys.argv[:1])
+    from ui.main_window import YouTubeDownloader
+
+    # Leave the user's interrupted downloads for the real application
+    YouTubeDownloader.resume_interrupted_downloads = lambda self: None
+    window = YouTubeDownloader()
+    # Time a real extraction, not a cache hit
+    window.metadata_cache = None
+    result = {}
+
+    def finish():
+        print(json.dumps(result))
+        app.quit()
+
+    def fetch_finished(success, data, message):
+        result['first_fetch'] = time.time() - started_at
+        result['fetch_ok'] = success
+        finish()
+
+    class FirstPaint(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Paint and 'first_paint' not in result:
+                result['first_paint'] = time.time() - started_at
+                if url:
+                    # Fetch as if the URL was pasted `delay` seconds after the window showed up
+                    QTimer.singleShot(int(delay * 1000), start_fetch)
+                else:
+                    QTimer.singleShot(0, finish)
+            return False
+
+    def start_fetch():
+        window.url_input.setText(url)
+        window.fetch_video_info()
+        window.fetch_thread.finished.connect(fetch_finished)
+
+    paint_filter = FirstPaint()
+    window.installEventFilter(paint_filter)
+    window.show()
+    app.exec_()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help="number of startups to measure")
+    parser.add_argument('--url', help="also measure time-to-first-fetch for this URL")
+    parser.add_argument('--delay', type=float, default=0.0,
+                        help="seconds between first paint and the fetch, like a user pasting a link")
+    parser.add_argument('--child', type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        run_child(args.child, args.url, args.delay)
+        return
+
+    samples = []
+    for run in range(args.runs):
+        command = [sys.executable, os.path.abspath(__file__), '--child', repr(time.time())]
+        if args.url:
+            command += ['--url', args.url, '--delay', str(args.delay)]
+        output = subprocess.run(command, capture_output=True, text=True, cwd=ROOT).stdout
+        lines = [line for line in output.splitlines() if line.startswith('{')]
+        if not lines:
+            sys.exit(f"Run {run + 1} reported no timings:\n{output}")
+        samples.append(json.loads(lines[-1]))
+        print(f"run {run + 1}: " + ", ".join(
+            f"{key}={value:.3f}s" for key, value in samples[-1].items() if key != 'fetch_ok'))
+
+    for key in ('first_paint', 'first_fetch'):
+        values = [sample[key] for sample in samples if key in sample]
+        if values:
+            print(f"{key}: median {statistics.median(values):.3f}s, "
+                  f"min {min(values):.3f}s, max {max(values):.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+from PyQt5.QtCore import QCoreApplication, QObject, QTimer, pyqtSignal
+from threads.bulk_fetch import BulkFetchService, queue_fetched
+from threads.control_api import ControlApiServer, generate_token
+from threads.download_queue import DownloadJob, DownloadQueue
+from threads.post_processing import post_process_options
+from threads.process_backend import shutdown_process_pool
+from utils.formats import FormatQuery
+from utils.journal import JobJournal
+from utils.metadata_cache import MetadataCache
+from utils.ydl_pool import shutdown_ydl_pool
+
+# Kept apart from the GUI's jobs.db, so neither resumes the other's downloads
+CLI_JOURNAL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cli_jobs.db')
+
+
+def batch_line_urls(line):
+    # Lines starting with '#' are comments, like in yt-dlp batch files
+    return [] if line.lstrip().startswith('#') else line.split()
+
+
+class HeadlessDownloader(QObject):
+    """
+    Drives the GUI's fetch and download engine (BulkFetchService feeding a
+    DownloadQueue) without a display and reports every event as one JSON
+    object per line.
+    """
+    urls_read = pyqtSignal(list)
+    input_closed = pyqtSignal()
+
+    def __init__(self, args, output):
+        super().__init__()
+        self.args = args
+        self.output = output
+        self.query = FormatQuery.parse(args.format)
+        self.download_path = os.path.abspath(args.output)
+        self.cache = None if args.no_cache else MetadataCache()
+        self.input_done = False
+        self.keys = set()  # Videos queued so far, links to the same video are skipped
+        self.urls = {}  # job id -> URL
+        self.last_progress = {}  # job id -> time of the last progress line
+        self.counts = {DownloadJob.COMPLETED: 0, DownloadJob.FAILED: 0, DownloadJob.CANCELLED: 0}
+        self.fetch_failures = 0
+
+        self.download_queue = DownloadQueue(args.jobs, args.connections,
+                                            JobJournal(CLI_JOURNAL_FILE), parent=self)
+        self.download_queue.set_use_process_pool(args.process_pool)
+        self.download_queue.set_rate_limits(args.rate_limit * 1024, args.job_rate_limit * 1024)
+        self.download_queue.set_fragment_buffer_size(args.fragment_buffer * 1024 * 1024)
+        self.download_queue.set_stream_merge(args.stream_merge)
+        self.download_queue.set_audio_transcode(args.extract_audio)
+        self.download_queue.set_post_processing(post_process_options(
+            args.extract_audio, args.optimize_video, args.add_metadata))
+        self.download_queue.job_added.connect(self.job_added)
+        self.download_queue.job_progress.connect(self.job_progress)
+        self.download_queue.job_status.connect(self.job_status)
+        self.download_queue.job_finished.connect(self.job_finished)
+
+        self.bulk_fetch = BulkFetchService(cache=self.cache, parent=self)
+        self.bulk_fetch.result.connect(self.fetch_result)
+        self.bulk_fetch.idle.connect(self.check_done)
+        self.urls_read.connect(self.submit)
+        self.input_closed.connect(self.close_input)
+
+        self.control_api = None
+        if args.api_port:
+            self.control_api = ControlApiServer(
+                self.download_queue, lambda: self.download_path,
+                args.api_token or generate_token(), self.cache, args.api_port, parent=self)
+
+    def emit(self, event, **fields):
+        self.output.write(json.dumps({'event': event, 'time': round(time.time(), 3), **fields}) + '\n')
+        self.output.flush()
+
+    def start(self):
+        if self.control_api:
+            try:
+                self.control_api.start()
+            except OSError as e:
+                self.emit('api_failed', port=self.args.api_port, message=str(e))
+                QCoreApplication.instance().exit(2)
+                return
+            self.emit('api', port=self.args.api_port, token=self.control_api.token)
+        if self.args.resume:
+            self.download_queue.resume_interrupted()
+        self.submit(self.args.urls)
+
+        if self.args.batch_file:
+            threading.Thread(target=self.read_batch_file, daemon=True).start()
+        else:
+            self.close_input()
+
+    def read_batch_file(self):
+        """Runs in its own thread, `-` (stdin) is read as lines come in"""
+        if self.args.batch_file == '-':
+            for line in sys.stdin:
+                self.urls_read.emit(batch_line_urls(line))
+        else:
+            with open(self.args.batch_file, encoding='utf-8') as f:
+                self.urls_read.emit([url for line in f for url in batch_line_urls(line)])
+        self.input_closed.emit()
+
+    def submit(self, urls):
+        if urls:
+            self.bulk_fetch.submit(urls, self.args.refresh)
+
+    def close_input(self):
+        self.input_done = True
+        self.check_done()
+
+    def fetch_result(self, url, key, success, data, message):
+        if not success:
+            self.fetch_failures += 1
+            self.emit('fetch_failed', url=url, message=message)
+        elif key in self.keys:
+            self.emit('skipped', url=url, reason="duplicate")
+        else:
+            self.keys.add(key)
+            if not queue_fetched(self.download_queue, url, data, self.query, self.download_path) \
+                    and 'playlist' not in data:
+                self.fetch_failures += 1
+                self.emit('fetch_failed', url=url, message="No format matches the rules")
+        self.check_done()
+
+    def job_added(self, job_id):
+        # Also covers jobs resumed from the journal and submitted through the API
+        job = self.download_queue.get_job(job_id)
+        self.urls[job_id] = job.url
+        self.emit('queued', job=job_id, url=job.url, format=job.format_id)
+
+    def job_progress(self, job_id, record):
+        now = time.monotonic()
+        if now - self.last_progress.get(job_id, 0.0) < self.args.progress_interval:
+            return
+        self.last_progress[job_id] = now
+        self.emit('progress', job=job_id, **record)
+
+    def job_status(self, job_id, status):
+        self.emit('status', job=job_id, state=self.download_queue.get_job(job_id).state,
+                  status=status)
+
+    def job_finished(self, job_id, success, message):
+        state = self.download_queue.get_job(job_id).state
+        self.counts[state] += 1
+        self.last_progress.pop(job_id, None)
+        self.emit('finished', job=job_id, url=self.urls.pop(job_id, None), state=state,
+                  success=success, message=message)
+        self.check_done()
+
+    def check_done(self):
+        if self.args.daemon or not self.input_done:
+            return
+        if self.bulk_fetch.pending_count() or self.download_queue.active_count():
+            return
+        QCoreApplication.instance().quit()
+
+    def summary(self):
+        self.emit('summary', completed=self.counts[DownloadJob.COMPLETED],
+                  failed=self.counts[DownloadJob.FAILED] + self.fetch_failures,
+                  cancelled=self.counts[DownloadJob.CANCELLED])
+        return self.counts[DownloadJob.FAILED] + self.fetch_failures
+
+    def shutdown(self):
+        """Stop what is still running, unfinished downloads stay journaled for --resume"""
+        self.bulk_fetch.shutdown()
+        if self.control_api and self.control_api.httpd:
+            self.control_api.stop()
+        self.download_queue.shutdown()
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Download videos without the GUI. Progress is printed as JSON lines on stdout.")
+    parser.add_argument('urls', nargs='*', help="video or playlist URLs")
+    parser.add_argument('-a', '--batch-file', metavar='FILE',
+                        help="file with URLs separated by whitespace, '-' for stdin")
+    parser.add_argument('-o', '--output', default='.', metavar='DIR',
+                        help="download directory (default: current directory)")
+    parser.add_argument('-f', '--format', default='best', metavar='RULES',
+                        help="format rules, e.g. 'height<=1080,vcodec=av01,abr>=128' or 'audio'")
+    parser.add_argument('-j', '--jobs', type=int, default=3,
+                        help="downloads running at once (default: 3)")
+    parser.add_argument('-c', '--connections', type=int, default=10,
+                        help="upper limit of parallel fragment downloads per job (default: 10)")
+    parser.add_argument('--rate-limit', type=int, default=0, metavar='KIB',
+                        help="total bandwidth cap in KiB/s (default: unlimited)")
+    parser.add_argument('--job-rate-limit', type=int, default=0, metavar='KIB',
+                        help="bandwidth cap per download in KiB/s (default: unlimited)")
+    parser.add_argument('--fragment-buffer', type=int, default=64, metavar='MIB',
+                        help="HLS/DASH fragments a download may hold in memory, in MiB (default: 64)")
+    parser.add_argument('--stream-merge', action='store_true',
+                        help="merge separate video and audio formats while they download (needs ffmpeg)")
+    parser.add_argument('-x', '--extract-audio', metavar='FORMAT',
+                        choices=('mp3', 'm4a', 'wav', 'flac', 'opus'),
+                        help="keep only the audio, converted to FORMAT (mp3, m4a, wav, flac, opus); "
+                             "with -f audio it is converted and tagged while it downloads")
+    parser.add_argument('--optimize-video', action='store_true',
+                        help="re-encode videos to H.264/AAC MP4 after download")
+    parser.add_argument('--add-metadata', action='store_true',
+                        help="embed metadata and the thumbnail into the downloaded files")
+    parser.add_argument('--process-pool', action='store_true',
+                        help="run downloads in worker processes")
+    parser.add_argument('--no-cache', action='store_true', help="don't use the video info cache")
+    parser.add_argument('--refresh', action='store_true',
+                        help="fetch video info again even when it is cached")
+    parser.add_argument('--resume', action='store_true',
+                        help="also resume downloads an interrupted run left behind")
+    parser.add_argument('--progress-interval', type=float, default=1.0, metavar='SECONDS',
+                        help="minimum time between progress lines of a job (default: 1)")
+    parser.add_argument('--daemon', action='store_true',
+                        help="keep running when the queue is empty, until interrupted")
+    parser.add_argument('--api-port', type=int, metavar='PORT',
+                        help="serve the control API on this localhost port (see threads/control_api.py)")
+    parser.add_argument('--api-token', metavar='TOKEN',
+                        help="token API requests must send (default: random, printed at startup)")
+    args = parser.parse_args(argv)
+
+    if not (args.urls or args.batch_file or args.resume or args.daemon):
+        parser.error("no URLs given")
+    try:
+        FormatQuery.parse(args.format)
+    except ValueError as e:
+        parser.error(str(e))
+    if not os.path.isdir(args.output):
+        parser.error(f"not a directory: {args.output}")
+    return args
+
+
+def main():
+    args = parse_arguments()
+
+    # yt-dlp and the worker processes print to stdout, keep it for the JSON lines
+    output = os.fdopen(os.dup(sys.stdout.fileno()), 'w', buffering=1)
+    sys.stdout.flush()
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    app = QCoreApplication(sys.argv)
+    runner = HeadlessDownloader(args, output)
+
+    interrupted = []
+    def stop(*_):
+        interrupted.append(True)
+        app.quit()
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    # Python only runs signal handlers between bytecodes, wake it up now and then
+    wakeup = QTimer()
+    wakeup.timeout.connect(lambda: None)
+    wakeup.start(200)
+
+    QTimer.singleShot(0, runner.start)
+    code = app.exec_()
+
+    runner.shutdown()
+    failed = runner.summary()
+    shutdown_process_pool()
+    shutdown_ydl_pool()
+    if interrupted:
+        return 130
+    if code:
+        return code
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    # Needed by the process pool backend in the frozen executable
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,123 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from PyQt5.QtCore import QObject, pyqtSignal
+from threads.fetch_thread import fetch_formats
+from utils.formats import FormatIndex
+from utils.metadata_cache import cache_key
+
+# Extraction is mostly waiting on the network, threads are enough
+MAX_FETCH_WORKERS = 8
+
+
+def _fetch(url, cache, force_refresh):
+    try:
+        return True, fetch_formats(url, cache, force_refresh), "Formats fetched successfully"
+    except Exception as e:
+        return False, {}, str(e)
+
+
+def queue_fetched(download_queue, url, data, query, download_path):
+    """
+    Queue the downloads for one fetch_formats result: every entry of a
+    playlist, or the formats `query` picks for a single video. Returns the
+    new job ids, empty when nothing could be queued.
+    """
+    if 'playlist' in data:
+        return [download_queue.add_job(entry['url'], query.to_selector(), download_path)
+                for entry in data['playlist']['entries'] if entry['url']]
+    format_str = FormatIndex.from_info(data.get('info_dict')).format_string(query)
+    if not format_str:
+        return []
+    return [download_queue.add_job(url, format_str, download_path,
+                                   info=data.get('info_dict'),
+                                   fetched_at=data.get('fetched_at'))]
+
+
+class BulkFetchService(QObject):
+    """
+    Fetches formats for many URLs on a bounded thread pool and emits each
+    result as soon as it is ready.
+
+    Requests for a video that is already being extracted (same extractor and
+    video ID, see cache_key) join that extraction instead of starting
+    another one, and all of them get its result.
+    """
+    result = pyqtSignal(str, str, bool, dict, str)  # url, key, success, data, message
+    idle = pyqtSignal()  # Every submitted URL has been answered
+
+    def __init__(self, max_workers=MAX_FETCH_WORKERS, cache=None, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.lock = threading.Lock()
+        self.in_flight = {}  # cache key -> Future
+        self.outstanding = 0
+
+    def submit(self, urls, force_refresh=False):
+        """Queue `urls` for extraction, results arrive through `result`"""
+        urls = list(urls)
+        with self.lock:
+            self.outstanding += len(urls)
+        # Matching hundreds of URLs against the extractors takes a moment,
+        # keep it off the caller's (GUI) thread
+        threading.Thread(target=self._dispatch, args=(urls, force_refresh), daemon=True).start()
+
+    def _dispatch(self, urls, force_refresh):
+        # The executor and the futures are used outside the lock: a done
+        # future runs a new callback right away, and shutting the executor
+        # down runs the callbacks of the futures it cancels. Both take the lock.
+        for position, url in enumerate(urls):
+            key = cache_key(url)
+            with self.lock:
+                future = self.in_flight.get(key)
+                started = future is None
+                if started:
+                    # Claims the video, filled in by the executor's job
+                    future = self.in_flight[key] = Future()
+            if started:
+                future.add_done_callback(lambda f, key=key: self._forget(key, f))
+                try:
+                    job = self.executor.submit(_fetch, url, self.cache, force_refresh)
+                except RuntimeError:
+                    # Shut down while dispatching, the rest will never be answered
+                    future.cancel()
+                    self._settle(len(urls) - position)
+                    return
+                job.add_done_callback(lambda job, future=future: self._relay(job, future))
+            future.add_done_callback(lambda f, url=url, key=key: self._deliver(url, key, f))
+
+    def pending_count(self):
+        with self.lock:
+            return self.outstanding
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _forget(self, key, future):
+        with self.lock:
+            if self.in_flight.get(key) is future:
+                del self.in_flight[key]
+
+    @staticmethod
+    def _relay(job, future):
+        if job.cancelled():
+            future.cancel()
+        else:
+            future.set_result(job.result())
+
+    def _deliver(self, url, key, future):
+        if future.cancelled():
+            success, data, message = False, {}, "Fetch cancelled"
+        else:
+            success, data, message = future.result()
+        # Emitted from a pool thread, so receivers get it queued on their own thread
+        self.result.emit(url, key, success, data, message)
+        self._settle(1)
+
+    def _settle(self, count):
+        """`count` submitted URLs are done with"""
+        with self.lock:
+            self.outstanding -= count
+            done = self.outstanding == 0
+        if done:
+            self.idle.emit()
@@ -0,0 +1,343 @@
+import json
+import queue
+import re
+import secrets
+import threading
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from PyQt5.QtCore import QObject, pyqtSignal
+from threads.bulk_fetch import BulkFetchService, queue_fetched
+from utils.formats import FormatQuery
+
+DEFAULT_PORT = 9614
+# Events buffered per /events client, the oldest are dropped beyond that
+SUBSCRIBER_QUEUE_SIZE = 1000
+# Seconds between keep-alive comments on a quiet event stream
+KEEPALIVE_INTERVAL = 15
+# Seconds a request waits for the thread that owns the queue
+CALL_TIMEOUT = 10
+
+JOB_PATH = re.compile(r'^/jobs/(\d+)(/move)?$')
+
+
+def generate_token():
+    return secrets.token_urlsafe(16)
+
+
+class EventSubscriber:
+    """
+    Event buffer of one /events client. Adding never blocks: when the
+    client can't keep up, its oldest events are dropped and it is told how
+    many it missed.
+    """
+    def __init__(self, size=SUBSCRIBER_QUEUE_SIZE):
+        self.events = queue.Queue(size)
+        self.lock = threading.Lock()
+        self.dropped = 0
+
+    def put(self, event):
+        with self.lock:
+            while True:
+                try:
+                    self.events.put_nowait(event)
+                    return
+                except queue.Full:
+                    try:
+                        self.events.get_nowait()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+
+    def get(self, timeout):
+        """Next event and the number dropped before it, raises queue.Empty on timeout"""
+        event = self.events.get(timeout=timeout)
+        with self.lock:
+            dropped, self.dropped = self.dropped, 0
+        return event, dropped
+
+
+class ControlApiServer(QObject):
+    """
+    Localhost HTTP/JSON API to submit, list, cancel and reorder jobs of a
+    DownloadQueue, with a Server-Sent Events stream of its progress.
+
+        GET    /jobs              all jobs and the order of the waiting ones
+        POST   /jobs              {"urls": [...], "format": "height<=1080", "output": "/dir"}
+        GET    /jobs/<id>
+        DELETE /jobs/<id>         cancel
+        POST   /jobs/<id>/move    {"position": 0} moves a waiting job, 0 starts next
+        GET    /events            text/event-stream of queued/progress/status/finished events
+
+    Every request needs the token, as "Authorization: Bearer <token>" or,
+    for EventSource clients, a "token" query parameter.
+
+    Requests are served on their own threads and hand queue operations to
+    the thread the server object lives in. Events are copied into each
+    subscriber's bounded buffer, so a slow client never holds up the queue
+    or the downloads.
+    """
+    call_requested = pyqtSignal(object, object)  # function, Future
+
+    def __init__(self, download_queue, default_path, token, cache=None,
+                 port=DEFAULT_PORT, parent=None):
+        super().__init__(parent)
+        self.download_queue = download_queue
+        self.default_path = default_path  # Callable, download directory when a request has none
+        self.token = token
+        self.port = port
+        self.httpd = None
+        self.subscribers = set()
+        self.subscribers_lock = threading.Lock()
+        self.submissions = {}  # url -> deque of (query, download_path) waiting for the fetch
+
+        self.call_requested.connect(self.run_call)
+        self.bulk_fetch = BulkFetchService(cache=cache, parent=self)
+        self.bulk_fetch.result.connect(self.fetch_result)
+        download_queue.job_added.connect(self.job_added)
+        download_queue.job_progress.connect(self.job_progress)
+        download_queue.job_status.connect(self.job_status)
+        download_queue.job_finished.connect(self.job_finished)
+
+    def start(self):
+        """Start serving on 127.0.0.1, raises OSError when the port is taken"""
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', self.port), _RequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.api = self
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+        self.broadcast(None)  # Ends the event streams
+        self.bulk_fetch.shutdown()
+        for signal, slot in ((self.download_queue.job_added, self.job_added),
+                             (self.download_queue.job_progress, self.job_progress),
+                             (self.download_queue.job_status, self.job_status),
+                             (self.download_queue.job_finished, self.job_finished)):
+            signal.disconnect(slot)
+
+    def check_token(self, token):
+        return bool(token) and secrets.compare_digest(token, self.token)
+
+    # Called from request threads
+
+    def call(self, function):
+        """Run `function` on the server object's thread and return its result"""
+        future = Future()
+        self.call_requested.emit(function, future)
+        return future.result(timeout=CALL_TIMEOUT)
+
+    def subscribe(self):
+        subscriber = EventSubscriber()
+        with self.subscribers_lock:
+            self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.subscribers_lock:
+            self.subscribers.discard(subscriber)
+
+    # Run on the server object's thread
+
+    def run_call(self, function, future):
+        try:
+            future.set_result(function())
+        except Exception as e:
+            future.set_exception(e)
+
+    def broadcast(self, event):
+        with self.subscribers_lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            subscriber.put(event)
+
+    def list_jobs(self):
+        return {
+            'jobs': [job.to_dict() for job in self.download_queue.jobs.values()],
+            'queue': self.download_queue.queued_job_ids(),
+        }
+
+    def get_job(self, job_id):
+        job = self.download_queue.get_job(job_id)
+        return job.to_dict() if job else None
+
+    def cancel_job(self, job_id):
+        self.download_queue.cancel_job(job_id)
+        return self.get_job(job_id)
+
+    def move_job(self, job_id, position):
+        return self.download_queue.move_job(job_id, position)
+
+    def submit(self, urls, query, download_path):
+        for url in urls:
+            self.submissions.setdefault(url, deque()).append((query, download_path))
+        self.bulk_fetch.submit(urls)
+
+    def fetch_result(self, url, key, success, data, message):
+        query, download_path = self.submissions[url].popleft()
+        if not self.submissions[url]:
+            del self.submissions[url]
+        if success and not queue_fetched(self.download_queue, url, data, query, download_path) \
+                and 'playlist' not in data:
+            success, message = False, "No format matches the rules"
+        if not success:
+            self.broadcast(('fetch_failed', {'url': url, 'message': message}))
+
+    def job_added(self, job_id):
+        self.broadcast(('queued', self.download_queue.get_job(job_id).to_dict()))
+
+    def job_progress(self, job_id, record):
+        self.broadcast(('progress', {'job': job_id, **record}))
+
+    def job_status(self, job_id, status):
+        job = self.download_queue.get_job(job_id)
+        self.broadcast(('status', {'job': job_id, 'state': job.state, 'status': status}))
+
+    def job_finished(self, job_id, success, message):
+        job = self.download_queue.get_job(job_id)
+        self.broadcast(('finished', {'job': job_id, 'url': job.url, 'state': job.state,
+                                     'success': success, 'message': message}))
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    server_version = "StreamSaver"
+
+    @property
+    def api(self):
+        return self.server.api
+
+    def log_message(self, format, *args):
+        pass  # Polled by other tools, don't fill the console
+
+    def do_OPTIONS(self):
+        # CORS preflight for browser extensions
+        self.send_response(204)
+        self.send_cors_headers()
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, DELETE, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Authorization, Content-Type')
+        self.end_headers()
+
+    def do_GET(self):
+        self.handle_api_request('GET')
+
+    def do_POST(self):
+        self.handle_api_request('POST')
+
+    def do_DELETE(self):
+        self.handle_api_request('DELETE')
+
+    def handle_api_request(self, method):
+        url = urlsplit(self.path)
+        token = self.headers.get('Authorization', '')
+        token = token[len('Bearer '):] if token.startswith('Bearer ') else \
+            parse_qs(url.query).get('token', [''])[0]
+        if not self.api.check_token(token):
+            self.send_json(401, {'error': "Missing or wrong token"})
+            return
+
+        try:
+            if url.path == '/events' and method == 'GET':
+                self.stream_events()
+            elif url.path == '/jobs' and method == 'GET':
+                self.send_json(200, self.api.call(self.api.list_jobs))
+            elif url.path == '/jobs' and method == 'POST':
+                self.submit_jobs()
+            elif JOB_PATH.match(url.path):
+                job_id, move = JOB_PATH.match(url.path).groups()
+                self.handle_job(method, int(job_id), bool(move))
+            else:
+                self.send_json(404, {'error': "Not found"})
+        except ValueError as e:
+            self.send_json(400, {'error': str(e)})
+        except Exception as e:
+            self.send_json(500, {'error': str(e)})
+
+    def handle_job(self, method, job_id, move):
+        if move and method == 'POST':
+            position = self.read_json().get('position', 0)
+            if not self.api.call(lambda: self.api.move_job(job_id, position)):
+                self.send_json(409, {'error': "Job is not waiting in the queue"})
+                return
+            result = self.api.call(lambda: self.api.get_job(job_id))
+        elif not move and method == 'GET':
+            result = self.api.call(lambda: self.api.get_job(job_id))
+        elif not move and method == 'DELETE':
+            result = self.api.call(lambda: self.api.cancel_job(job_id))
+        else:
+            self.send_json(405, {'error': "Method not allowed"})
+            return
+        if result is None:
+            self.send_json(404, {'error': "No such job"})
+        else:
+            self.send_json(200, result)
+
+    def submit_jobs(self):
+        body = self.read_json()
+        urls = body.get('urls') or ([body['url']] if body.get('url') else [])
+        if not urls or not all(isinstance(url, str) for url in urls):
+            raise ValueError("Expected \"url\" or a list of \"urls\"")
+        query = FormatQuery.parse(body.get('format', 'best'))
+        download_path = body.get('output') or self.api.default_path()
+        if not download_path:
+            raise ValueError("No download location given or configured")
+        self.api.call(lambda: self.api.submit(urls, query, download_path))
+        # Job ids follow as "queued" events once the formats are fetched
+        self.send_json(202, {'submitted': len(urls)})
+
+    def stream_events(self):
+        subscriber = self.api.subscribe()
+        try:
+            self.send_response(200)
+            self.send_cors_headers()
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            while True:
+                try:
+                    event, dropped = subscriber.get(KEEPALIVE_INTERVAL)
+                except queue.Empty:
+                    self.wfile.write(b": keep-alive\n\n")
+                    self.wfile.flush()
+                    continue
+                if event is None:
+                    break
+                if dropped:
+                    # Clients should re-read /jobs to catch up
+                    self.write_event('dropped', {'count': dropped})
+                self.write_event(*event)
+        except OSError:
+            pass  # Client went away
+        finally:
+            self.api.unsubscribe(subscriber)
+
+    def write_event(self, name, data):
+        self.wfile.write(f"event: {name}\ndata: {json.dumps(data)}\n\n".encode('utf-8'))
+        self.wfile.flush()
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        try:
+            body = json.loads(self.rfile.read(length))
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON: {e}")
+        if not isinstance(body, dict):
+            raise ValueError("Expected a JSON object")
+        return body
+
+    def send_cors_headers(self):
+        self.send_header('Access-Control-Allow-Origin', '*')
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_cors_headers()
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
@@ -0,0 +1,340 @@
+from collections import deque
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from threads.download_thread import DownloadThread
+from threads.post_processing import PostProcessService
+from threads.process_backend import ProcessDownloadThread
+from utils.journal import JobJournal
+from utils.rate_limiter import BandwidthLimiter
+
+
+class DownloadJob:
+    QUEUED = "queued"
+    RUNNING = "running"
+    POST_PROCESSING = "post_processing"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    def __init__(self, job_id, url, format_id, download_path, journal_id=None,
+                 info=None, fetched_at=None):
+        self.job_id = job_id
+        self.journal_id = journal_id
+        self.info = info
+        self.fetched_at = fetched_at
+        self.url = url
+        self.format_id = format_id
+        self.download_path = download_path
+        self.state = DownloadJob.QUEUED
+        self.percent = 0.0
+        self.progress = {}  # Latest progress record from DownloadThread
+        self.status = "Queued"
+        self.thread = None
+        self.post_process_options = None  # Taken from the queue when the job starts
+
+    def is_active(self):
+        return self.state in (DownloadJob.QUEUED, DownloadJob.RUNNING, DownloadJob.POST_PROCESSING)
+
+    def to_dict(self):
+        return {
+            'job': self.job_id,
+            'url': self.url,
+            'format': self.format_id,
+            'download_path': self.download_path,
+            'state': self.state,
+            'percent': self.percent,
+            'status': self.status,
+            'progress': self.progress,
+        }
+
+
+class DownloadQueue(QObject):
+    """
+    Runs many download jobs with at most `max_concurrent` DownloadThreads
+    alive at once. Jobs start in the order they were added.
+
+    Downloads that finish while post-processing is on hand their files to
+    a PostProcessService and free their slot for the next job; the job
+    ends when its post-processing does.
+
+    Every job is recorded in a JobJournal until it ends, so jobs that were
+    running when the app was killed can be picked up with resume_interrupted.
+
+    Progress records from the threads are only stored when they arrive;
+    job_progress and overall_progress are emitted for the jobs that changed
+    once per PROGRESS_INTERVAL, however many jobs are running.
+    """
+    PROGRESS_INTERVAL = 100  # ms
+
+    job_added = pyqtSignal(int)
+    job_progress = pyqtSignal(int, dict)           # job_id, progress record
+    job_finished = pyqtSignal(int, bool, str)      # job_id, success, message
+    job_status = pyqtSignal(int, str)              # job_id, status of a job past its download
+    overall_progress = pyqtSignal(float, int, int) # percent, running, queued
+
+    def __init__(self, max_concurrent=3, max_connections=10, journal=None, parent=None):
+        super().__init__(parent)
+        self.journal = journal or JobJournal()
+        self.limiter = BandwidthLimiter()
+        self.max_concurrent = max(1, int(max_concurrent or 1))
+        self.max_connections = max_connections
+        self.jobs = {}
+        self.pending = deque()
+        self.running = set()
+        self.batch = []  # Job ids counted in the aggregate progress
+        self.next_job_id = 1
+        self.dirty = set()  # Jobs with progress not yet emitted
+        self.keep_journal = False
+        self.use_process_pool = False
+        self.fragment_buffer_size = None  # Bytes of HLS/DASH fragments held per job
+        self.stream_merge = False
+        self.audio_transcode = None  # Format audio-only downloads are converted to
+        self.post_processing = set()  # Jobs whose files are being post-processed
+        self.post_process_options = None
+        self.post_processor = PostProcessService(parent=self)
+        self.post_processor.finished.connect(self._on_post_processed)
+
+        self.progress_timer = QTimer(self)
+        self.progress_timer.setInterval(self.PROGRESS_INTERVAL)
+        self.progress_timer.timeout.connect(self._flush_progress)
+
+    def add_job(self, url, format_id, download_path, journal_id=None, info=None, fetched_at=None):
+        """
+        Queue a download and return its job id. `info` is an info dict from
+        fetch_formats that the download can start from without extracting again.
+        """
+        if not self.running and not self.pending:
+            # Previous batch is done, start aggregating from scratch
+            self.batch = []
+
+        if journal_id is None:
+            journal_id = self.journal.add_job(url, format_id, download_path)
+        job = DownloadJob(self.next_job_id, url, format_id, download_path, journal_id,
+                          info, fetched_at)
+        self.next_job_id += 1
+        self.jobs[job.job_id] = job
+        self.pending.append(job.job_id)
+        self.batch.append(job.job_id)
+
+        self.job_added.emit(job.job_id)
+        self._schedule()
+        self._emit_overall_progress()
+        return job.job_id
+
+    def resume_interrupted(self):
+        """Re-queue the jobs a previous run left in the journal"""
+        job_ids = []
+        for entry in self.journal.interrupted_jobs():
+            # Prefer the format yt-dlp picked last time so the partial
+            # files on disk match what gets downloaded now
+            format_id = entry['resolved_format_id'] or entry['format_id']
+            job_ids.append(self.add_job(
+                entry['url'], format_id, entry['download_path'], entry['id']))
+        return job_ids
+
+    def get_job(self, job_id):
+        return self.jobs.get(job_id)
+
+    def cancel_job(self, job_id):
+        job = self.jobs.get(job_id)
+        if not job or not job.is_active():
+            return
+
+        if job.state == DownloadJob.QUEUED:
+            self.pending.remove(job_id)
+            self._finish_job(job, DownloadJob.CANCELLED, "Download cancelled by user")
+        elif job.state == DownloadJob.POST_PROCESSING:
+            # Only while it waits for a worker, a running transcode finishes
+            self.post_processor.cancel(job_id)
+        elif job.thread:
+            job.status = "Cancelling..."
+            job.thread.cancel_download()
+
+    def move_job(self, job_id, position):
+        """
+        Move a queued job to `position` in the waiting line, 0 starts next.
+        Returns False when the job isn't waiting.
+        """
+        if job_id not in self.pending:
+            return False
+        self.pending.remove(job_id)
+        position = max(0, min(int(position), len(self.pending)))
+        self.pending.insert(position, job_id)
+        return True
+
+    def queued_job_ids(self):
+        """Waiting jobs in the order they will start"""
+        return list(self.pending)
+
+    def cancel_all(self):
+        for job_id in list(self.pending) + list(self.running) + list(self.post_processing):
+            self.cancel_job(job_id)
+
+    def shutdown(self, timeout=5000):
+        """Stop all downloads but leave them in the journal for the next start"""
+        self.keep_journal = True
+        self.pending.clear()
+        threads = [self.jobs[job_id].thread for job_id in self.running]
+        for thread in threads:
+            thread.cancel_download()
+        for thread in threads:
+            thread.wait(timeout)
+        self.post_processor.shutdown()
+
+    def set_max_concurrent(self, value):
+        self.max_concurrent = max(1, int(value or 1))
+        self._schedule()
+
+    def set_max_connections(self, value):
+        """Upper limit of parallel fragment downloads per job, running jobs included"""
+        self.max_connections = value
+        for job_id in self.running:
+            self.jobs[job_id].thread.set_max_connections(value)
+
+    def set_use_process_pool(self, value):
+        # Only affects jobs started after the change
+        self.use_process_pool = bool(value)
+
+    def set_fragment_buffer_size(self, value):
+        # Only affects jobs started after the change
+        self.fragment_buffer_size = value or None
+
+    def set_stream_merge(self, value):
+        # Only affects jobs started after the change
+        self.stream_merge = bool(value)
+
+    def set_audio_transcode(self, audio_format):
+        """
+        Convert and tag audio-only downloads while they download, to
+        `audio_format` (mp3, m4a, opus, flac or wav), None to keep them as
+        they are served. Only affects jobs started after the change.
+        """
+        self.audio_transcode = audio_format or None
+
+    def set_post_processing(self, options):
+        """
+        What to do with the files of finished downloads, see
+        post_process_options. Only affects jobs started after the change.
+        """
+        self.post_process_options = options
+
+    def set_rate_limits(self, global_rate, per_job_rate):
+        """Update the bandwidth caps (bytes/s, 0 = unlimited), running jobs included"""
+        self.limiter.set_rates(global_rate, per_job_rate)
+
+    def active_count(self):
+        return len(self.running) + len(self.pending) + len(self.post_processing)
+
+    def _schedule(self):
+        while self.pending and len(self.running) < self.max_concurrent:
+            job = self.jobs[self.pending.popleft()]
+            self._start_job(job)
+
+    def _start_job(self, job):
+        job.state = DownloadJob.RUNNING
+        job.status = "Starting download..."
+        job.post_process_options = self.post_process_options
+        self.running.add(job.job_id)
+
+        thread_class = ProcessDownloadThread if self.use_process_pool else DownloadThread
+        thread = thread_class(job.url, job.download_path, job.format_id, self.max_connections,
+                              self.journal, job.journal_id, self.limiter,
+                              job.info, job.fetched_at,
+                              fragment_buffer_size=self.fragment_buffer_size,
+                              stream_merge=self.stream_merge,
+                              audio_transcode=self.audio_transcode,
+                              write_thumbnail=bool(job.post_process_options and
+                                                   job.post_process_options['add_metadata']))
+        thread.progress.connect(
+            lambda record, job_id=job.job_id: self._on_progress(job_id, record))
+        thread.finished.connect(
+            lambda success, message, job_id=job.job_id: self._on_finished(job_id, success, message))
+        job.thread = thread
+        thread.start()
+
+        if not self.progress_timer.isActive():
+            self.progress_timer.start()
+
+    def _on_progress(self, job_id, record):
+        job = self.jobs.get(job_id)
+        if not job or job.state != DownloadJob.RUNNING:
+            return
+        job.progress = record
+        job.percent = record.get('percent', 0.0)
+        self.dirty.add(job_id)
+
+    def _flush_progress(self):
+        if self.dirty:
+            for job_id in sorted(self.dirty):
+                self.job_progress.emit(job_id, self.jobs[job_id].progress)
+            self.dirty.clear()
+            self._emit_overall_progress()
+        if not self.running:
+            self.progress_timer.stop()
+
+    def _on_finished(self, job_id, success, message):
+        job = self.jobs.get(job_id)
+        if not job:
+            return
+        self.running.discard(job_id)
+
+        if success and job.post_process_options and job.thread.downloads:
+            self._post_process(job, message)
+            self._schedule()
+            return
+
+        if success:
+            job.percent = 100.0
+            state = DownloadJob.COMPLETED
+        elif "cancelled by user" in message:
+            state = DownloadJob.CANCELLED
+        else:
+            state = DownloadJob.FAILED
+
+        self._finish_job(job, state, message)
+        self._schedule()
+
+    def _post_process(self, job, message):
+        job.state = DownloadJob.POST_PROCESSING
+        job.status = "Post-processing..."
+        job.percent = 100.0
+        self.dirty.discard(job.job_id)
+        self.post_processing.add(job.job_id)
+        self.post_processor.submit(job.job_id, job.thread.downloads, job.post_process_options,
+                                   message)
+        job.thread = None
+        self.job_status.emit(job.job_id, job.status)
+        self._emit_overall_progress()
+
+    def _on_post_processed(self, job_id, success, message):
+        job = self.jobs.get(job_id)
+        if not job or job_id not in self.post_processing:
+            return
+        self.post_processing.discard(job_id)
+        if success:
+            state = DownloadJob.COMPLETED
+        elif "cancelled by user" in message:
+            state = DownloadJob.CANCELLED
+        else:
+            state = DownloadJob.FAILED
+        self._finish_job(job, state, message)
+
+    def _finish_job(self, job, state, message):
+        job.state = state
+        job.status = message
+        job.thread = None
+        job.info = None  # Can be large, not needed once the job is done
+        self.dirty.discard(job.job_id)
+        if not self.keep_journal:
+            self.journal.finish_job(job.journal_id)
+        self.job_finished.emit(job.job_id, state == DownloadJob.COMPLETED, message)
+        self._emit_overall_progress()
+
+    def _emit_overall_progress(self):
+        counted = [self.jobs[job_id] for job_id in self.batch
+                   if self.jobs[job_id].state != DownloadJob.CANCELLED]
+        if counted:
+            percent = sum(100.0 if job.state == DownloadJob.FAILED else job.percent
+                          for job in counted) / len(counted)
+        else:
+            percent = 0.0
+        self.overall_progress.emit(percent, len(self.running), len(self.pending))
@@ -1,95 +1,248 @@
-import yt_dlp
+import copy
+import threading
+import time
 from PyQt5.QtCore import QThread, pyqtSignal
+from utils.autotuner import FragmentAutotuner, host_key
+from utils.ydl_pool import get_ydl_pool
+
+# Minimum seconds between two progress emissions (10 Hz)
+PROGRESS_INTERVAL = 0.1
+# Minimum seconds between two journal writes
+JOURNAL_INTERVAL = 1.0
+# Fetched info older than this is extracted again, its media URLs may have expired
+INFO_MAX_AGE = 30 * 60
+
+
+class DownloadLogger:
+    """Prints yt-dlp output like the default logger and spots retried requests"""
+    def __init__(self, on_retry):
+        self.on_retry = on_retry
+
+    def debug(self, msg):
+        # Fragment and HTTP retries are reported as "Got error: ..." lines
+        if 'Got error:' in msg:
+            self.on_retry()
+        print(msg)
+
+    def info(self, msg):
+        print(msg)
+
+    def warning(self, msg):
+        print(msg)
+
+    def error(self, msg):
+        print(msg)
+
 
 class DownloadThread(QThread):
-    progress = pyqtSignal(float, str)
+    # Progress record: downloaded_bytes, total_bytes, speed, eta, percent
+    progress = pyqtSignal(dict)
     finished = pyqtSignal(bool, str)
 
-    def __init__(self, url, download_path, format_id, max_concurrent_downloads=10):
+    def __init__(self, url, download_path, format_id, max_concurrent_downloads=10,
+                 journal=None, journal_id=None, limiter=None, info=None, fetched_at=None,
+                 fragment_buffer_size=None, stream_merge=False, write_thumbnail=False,
+                 audio_transcode=None):
         super().__init__()
         self.url = url
+        self.info = info  # Info dict from FetchThread, reused instead of extracting again
+        self.fetched_at = fetched_at
         self.download_path = download_path
         self.format_id = format_id
         self.is_cancelled = False
         self.max_concurrent_downloads = max_concurrent_downloads
+        self.journal = journal
+        self.journal_id = journal_id
+        self.limiter = limiter
+        self.fragment_buffer_size = fragment_buffer_size  # Bytes, None for the default
+        self.stream_merge = stream_merge  # Remux video and audio while they download
+        self.write_thumbnail = write_thumbnail  # Saved next to the video for post-processing
+        self.audio_transcode = audio_transcode  # Format audio-only downloads are converted to
+        self.downloads = []  # Info dicts of the files written, set once the download succeeded
+        self.stream_bytes = {}  # Bytes seen so far per output file
+        self.stream_fragments = {}  # Last fragment index seen per output file
+        self.tuner = None
+        self.host = None
+        self.ydl = None
+        self.progress_lock = threading.Lock()
+        self.last_emit = 0.0
+        self.last_journal_write = 0.0
 
     def run(self):
+        if self.limiter:
+            self.limiter.register(self)
         try:
             ydl_opts = {
                 'outtmpl': f'{self.download_path}/%(title)s.%(ext)s',
                 'hls_prefer_native': True,
+                'continuedl': True,  # Pick up .part/fragment state left by an interrupted run
                 'concurrent_fragment_downloads': self.max_concurrent_downloads,
                 'progress_hooks': [self.progress_hook],
-                'format': self.format_id
+                'logger': DownloadLogger(self.on_retry),
+                'format': self.format_id,
+                'stream_merge': self.stream_merge
             }
-            
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            if self.fragment_buffer_size:
+                ydl_opts['fragment_buffer_size'] = self.fragment_buffer_size
+            if self.write_thumbnail:
+                ydl_opts['writethumbnail'] = True
+            if self.audio_transcode:
+                ydl_opts['audio_transcode'] = self.audio_transcode
+
+            with get_ydl_pool().checkout(ydl_opts) as ydl:
+                self.ydl = ydl
                 if not self.is_cancelled:
-                    ydl.download([self.url])
-            
+                    # Resolve the format first so the journal knows exactly
+                    # what to resume, then download from the same info
+                    reused = self.has_fresh_info()
+                    if reused:
+                        # yt-dlp edits the dict in place and it may be shared with other jobs
+                        info = ydl.process_ie_result(copy.deepcopy(self.info), download=False)
+                    else:
+                        info = ydl.extract_info(self.url, download=False)
+                    if self.journal:
+                        self.journal.start_job(
+                            self.journal_id, info.get('format_id'), ydl.prepare_filename(info))
+                    self.start_tuner(info)
+                    if not self.is_cancelled:
+                        try:
+                            info = ydl.process_ie_result(info, download=True)
+                        except Exception as e:
+                            if not reused or self.is_cancelled:
+                                raise
+                            # The fetched URLs may have been rejected, try once more
+                            # with a fresh extraction (partial files are continued)
+                            print(f"Retrying with a fresh extraction: {e}")
+                            info = ydl.extract_info(self.url, download=False)
+                            info = ydl.process_ie_result(info, download=True)
+                        self.downloads = self.downloaded_files(ydl, info)
+                    self.save_tuner()
+
             if self.is_cancelled:
                 self.finished.emit(False, "Download cancelled by user")
             else:
                 self.finished.emit(True, "Download completed successfully!")
-                
+
         except Exception as e:
             self.finished.emit(False, str(e))
+        finally:
+            self.ydl = None  # Back in the pool
+            if self.limiter:
+                self.limiter.unregister(self)
 
     def cancel_download(self):
         self.is_cancelled = True
 
+    def set_max_connections(self, value):
+        """New upper limit for fragment parallelism, applied like the tuner's changes"""
+        self.max_concurrent_downloads = value
+        if self.tuner:
+            self.tuner.set_maximum(value)
+
+    @staticmethod
+    def downloaded_files(ydl, info):
+        """
+        Info dict of each file the download wrote, video fields and its format's
+        together, as plain data that can be sent to a post-processing worker.
+        Files AudioTranscodeFD wrote are left out, they are converted and tagged.
+        """
+        # Imported with the pooled YoutubeDL, like yt-dlp itself
+        from utils.audio_transcode import AUDIO_TRANSCODE_PROTOCOL
+
+        video = {key: value for key, value in info.items()
+                 if key not in ('formats', 'requested_downloads', 'automatic_captions', 'subtitles')}
+        return [ydl.sanitize_info({**video, **download})
+                for download in info.get('requested_downloads') or ()
+                if download.get('protocol') != AUDIO_TRANSCODE_PROTOCOL]
+
+    def has_fresh_info(self):
+        if not self.info or self.fetched_at is None:
+            return False
+        return time.time() - self.fetched_at < INFO_MAX_AGE
+
     def progress_hook(self, d):
         if self.is_cancelled:
             raise Exception("Download cancelled by user")
-            
+
+        # yt-dlp calls this for every chunk, from several threads when
+        # fragments download concurrently. Only the latest state is
+        # forwarded, at most every PROGRESS_INTERVAL seconds, and the
+        # formatting is left to the UI.
+        if d['status'] not in ('downloading', 'finished'):
+            return
+
         if d['status'] == 'downloading':
-            size = d.get('total_bytes', d.get('total_bytes_estimate', 0))
-            percent = d.get('downloaded_bytes', 0) / size * 100
-            if percent:
-                # Convert to float if it's not None and clamp between 0-100
-                percent = float(percent) if percent is not None else 0
-                percent = max(0, min(percent, 100))
-                
-                # Format download info
-                speed = d.get('speed', 0)
-                if speed:
-                    # Convert speed to MB/s or KB/s or Bytes/s
-                    if speed > 1024 * 1024 * 1024:
-                        speed_str = f"{speed/1024/1024/1024:.2f} GiB/s"
-                    elif speed > 1024 * 1024:
-                        speed_str = f"{speed/1024/1024:.2f} MiB/s"
-                    elif speed > 1024:
-                        speed_str = f"{speed/1024:.2f} KiB/s"
-                    else:
-                        speed_str = f"{speed:.2f} Bytes/s"
-                else:
-                    speed_str = "calculating..."
-
-                if size:
-                    # Convert size to MiB or GiB or KiB or Bytes
-                    if size > 1024 * 1024 * 1024:
-                        size_str = f"{size/1024/1024/1024:.2f} GiB"
-                    elif size > 1024 * 1024:
-                        size_str = f"{size/1024/1024:.2f} MiB"
-                    elif size > 1024:
-                        size_str = f"{size/1024:.2f} KiB"
-                    else:
-                        size_str = f"{size:.2f} Bytes"
-                else:
-                    size_str = "calculating..."
-                
-                eta = d.get('eta', 0)
-                if eta:
-                    # Convert eta to (seconds or minutes seconds or hours minutes)
-                    eta = int(eta)
-                    if eta > 3600:
-                        eta_str = f"ETA: {eta//3600}h {eta%3600//60}m"
-                    elif eta > 60:
-                        eta_str = f"ETA: {eta//60}m {eta%60}s"
-                    else:
-                        eta_str = f"ETA: {eta}s"
-                else:
-                    eta_str = "calculating..."
-                
-                status = f"{percent:.1f}% ~ {size_str} | {speed_str} | {eta_str}"
-                self.progress.emit(percent, status)
\ No newline at end of file
+            self.account_bytes(d)
+
+        now = time.monotonic()
+        with self.progress_lock:
+            if d['status'] == 'downloading' and now - self.last_emit < PROGRESS_INTERVAL:
+                return
+            self.last_emit = now
+            write_journal = self.journal and now - self.last_journal_write >= JOURNAL_INTERVAL
+            if write_journal:
+                self.last_journal_write = now
+
+        size = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
+        downloaded = d.get('downloaded_bytes') or 0
+        percent = downloaded / size * 100 if size else 0.0
+
+        if write_journal:
+            self.journal.update_progress(
+                self.journal_id, downloaded, size,
+                d.get('fragment_index'), d.get('fragment_count'))
+
+        self.progress.emit({
+            'downloaded_bytes': downloaded,
+            'total_bytes': size,
+            'speed': d.get('speed') or 0,
+            'eta': d.get('eta') or 0,
+            'percent': max(0.0, min(float(percent), 100.0)),
+        })
+
+    def account_bytes(self, d):
+        key = d.get('tmpfilename') or d.get('filename')
+        downloaded = d.get('downloaded_bytes') or 0
+        fragment_index = d.get('fragment_index')
+        with self.progress_lock:
+            # The first report of a stream is the baseline. For a resumed
+            # .part file, segment plan or fragment download it counts what
+            # was already on disk, which must not be charged again.
+            previous = self.stream_bytes.get(key, downloaded)
+            self.stream_bytes[key] = downloaded
+            fragment_done = fragment_index is not None and \
+                fragment_index > self.stream_fragments.get(key, fragment_index)
+            if fragment_index is not None:
+                self.stream_fragments[key] = fragment_index
+
+        # A smaller count means the stream restarted, nothing new to charge
+        amount = downloaded - previous
+        if amount <= 0:
+            return
+        if self.tuner:
+            self.tuner.record_bytes(amount, fragment_done)
+            if self.ydl:
+                # HLS and DASH downloads apply it before their next fragment,
+                # other downloads when their next stream starts
+                self.ydl.params['concurrent_fragment_downloads'] = self.tuner.value
+        if self.limiter:
+            # Blocking here holds back the yt-dlp thread that reported the bytes
+            self.limiter.consume(self, amount, lambda: self.is_cancelled)
+
+    def on_retry(self):
+        if self.tuner:
+            self.tuner.record_error()
+
+    def start_tuner(self, info):
+        """Start fragment parallelism from what last worked on this host"""
+        formats = info.get('requested_formats') or [info]
+        self.host = host_key(formats[0].get('url'))
+        start = self.max_concurrent_downloads
+        if self.journal and self.host:
+            start = self.journal.get_host_connections(self.host) or start
+        self.tuner = FragmentAutotuner(start, maximum=self.max_concurrent_downloads)
+        self.ydl.params['concurrent_fragment_downloads'] = self.tuner.value
+
+    def save_tuner(self):
+        if self.journal and self.host and not self.is_cancelled:
+            self.journal.set_host_connections(self.host, self.tuner.value)
@@ -1,86 +1,161 @@
-import yt_dlp
+import time
 from PyQt5.QtCore import QThread, pyqtSignal
+from utils.formats import Format, FormatIndex
+from utils.metadata_cache import cache_key
+from utils.ydl_pool import get_ydl_pool
+from utils.ytdlp_loader import load_extractors
+
+# Playlist entries are handed out in pages of this size, or earlier when
+# the next entries take longer than PAGE_INTERVAL seconds to arrive
+PAGE_SIZE = 50
+PAGE_INTERVAL = 0.25
+
+FETCH_OPTIONS = {
+    'quiet': True,
+    'no_warnings': True,
+    'skip_download': True,
+}
+
+class FetchCancelled(Exception):
+    """The fetch was cancelled before the formats were resolved"""
+
+def playlist_entry(entry):
+    """The few fields the UI and the download queue need from a flat entry"""
+    return {
+        'id': entry.get('id'),
+        'title': entry.get('title') or entry.get('id') or 'Unknown Title',
+        'url': entry.get('url') or entry.get('webpage_url'),
+        'duration': entry.get('duration'),
+    }
+
+def stream_playlist_entries(entries, on_page, is_cancelled=None):
+    """Pass the entries to `on_page` in pages as the extractor yields them"""
+    page = []
+    count = 0
+    last_page = time.monotonic()
+    for entry in entries:
+        if is_cancelled and is_cancelled():
+            break
+        if not entry:
+            continue
+        page.append(playlist_entry(entry))
+        count += 1
+        now = time.monotonic()
+        if len(page) >= PAGE_SIZE or now - last_page >= PAGE_INTERVAL:
+            on_page(page)
+            page = []
+            last_page = now
+    if page:
+        on_page(page)
+    return count
+
+def fetch_formats(url, cache=None, force_refresh=False, on_entries=None, is_cancelled=None):
+    """
+    Extract the video info and sort its formats into video and audio lists.
+    The full info dict is kept under 'info_dict' so a download can start
+    from it without extracting the video again.
+
+    With a MetadataCache the result is served from and stored in the cache,
+    unless `force_refresh` is set.
+
+    Playlists and channels are not resolved video by video. Their entries
+    are read flat and lazily and passed to `on_entries` page by page (or
+    collected under data['playlist']['entries'] without a callback); their
+    formats are resolved when an entry is downloaded.
+
+    `is_cancelled` stops the entries from being read, and raises
+    FetchCancelled for a video whose formats aren't resolved yet.
+    """
+    key = cache_key(url) if cache else None
+    if cache and not force_refresh:
+        data = cache.get(key)
+        if data is not None:
+            return data
+
+    formats_data = {'video': [], 'audio': []}
+    video_info = {}
+    
+    with get_ydl_pool().checkout(FETCH_OPTIONS) as ydl:
+        # Unprocessed first: playlist entries stay a lazy iterator
+        info = ydl.extract_info(url, download=False, process=False)
+        if info.get('_type') == 'url':
+            info = ydl.extract_info(info['url'], download=False, process=False,
+                                    ie_key=info.get('ie_key'))
+
+        if info.get('_type') == 'playlist':
+            collected = []
+            count = stream_playlist_entries(
+                info.get('entries') or [], on_entries or collected.extend, is_cancelled)
+            return {
+                'formats': formats_data,
+                'info': {'title': info.get('title') or 'Untitled Playlist', 'thumbnail': ''},
+                'playlist': {'count': count, 'entries': collected},
+            }
+
+        # Resolving the formats is the slow part, don't start it for nothing
+        if is_cancelled and is_cancelled():
+            raise FetchCancelled("Fetch cancelled")
+        info = ydl.process_ie_result(info, download=False)
+        info_dict = ydl.sanitize_info(info)
+        
+        if info.get('formats'):
+            # Save video title and thumbnail
+            video_info['title'] = info.get('title', 'Unknown Title')
+            video_info['thumbnail'] = info.get('thumbnail', '')
+            
+            # Sorted best first by height, fps and bitrate (audio by bitrate)
+            index = FormatIndex(info['formats'])
+            for fmt in index.video:
+                formats_data['video'].append({
+                    'format_id': fmt.format_id,
+                    'display': fmt.display,
+                    'is_video_audio': fmt.kind == Format.VIDEO_AUDIO
+                })
+            for fmt in index.audio:
+                formats_data['audio'].append({
+                    'format_id': fmt.format_id,
+                    'display': fmt.display
+                })
+    
+    data = {
+        'formats': formats_data,
+        'info': video_info,
+        'info_dict': info_dict,
+        'fetched_at': time.time()
+    }
+    if cache and formats_data['video'] + formats_data['audio']:
+        cache.put(key, data)
+    return data
+
+
+def warm_up():
+    """
+    Import yt-dlp and prepare what the first fetch needs, so it doesn't pay
+    for it. Meant for a background thread once the window is up.
+    """
+    load_extractors()
+    get_ydl_pool().warm(FETCH_OPTIONS)
+
 
 class FetchThread(QThread):
+    entries = pyqtSignal(list)  # A page of playlist entries
     finished = pyqtSignal(bool, dict, str)
 
-    def __init__(self, url):
+    def __init__(self, url, cache=None, force_refresh=False):
         super().__init__()
         self.url = url
+        self.cache = cache
+        self.force_refresh = force_refresh
+        self.is_cancelled = False
+
+    def cancel(self):
+        self.is_cancelled = True
 
     def run(self):
         try:
-            ydl_opts = {
-                'quiet': True,
-                'no_warnings': True,
-                'skip_download': True,
-            }
-            
-            formats_data = {'video': [], 'audio': []}
-            video_info = {}
-            
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(self.url, download=False)
-                
-                if info.get('formats'):
-                    # Save video title and thumbnail
-                    video_info['title'] = info.get('title', 'Unknown Title')
-                    video_info['thumbnail'] = info.get('thumbnail', '')
-                    
-                    # Process formats
-                    for fmt in info['formats']:
-                        format_id = fmt.get('format_id', '')
-                        format_note = fmt.get('format_note', '')
-                        ext = fmt.get('ext', '')
-                        resolution = fmt.get('resolution', '')
-                        
-                        if fmt.get('vcodec') != 'none' and fmt.get('acodec') != 'none':
-                            # This is a format with both video and audio
-                            tbr = fmt.get('tbr', 0)
-                            vcodec = fmt.get('vcodec', '')
-                            acodec = fmt.get('acodec', '')
-                            quality_str = f"{resolution} [{vcodec}] [{acodec}] [{tbr}kbps] (With Audio)"
-                            formats_data['video'].append({
-                                'format_id': format_id,
-                                'display': quality_str,
-                                'is_video_audio': True
-                            })
-                        elif fmt.get('vcodec') != 'none':
-                            # Video-only format
-                            vbr = fmt.get('vbr', 0)
-                            vcodec = fmt.get('vcodec', '')
-                            quality_str = f"{resolution} [{vcodec}] [{vbr}kbps]"
-                            formats_data['video'].append({
-                                'format_id': format_id,
-                                'display': quality_str,
-                                'is_video_audio': False
-                            })
-                        elif fmt.get('acodec') != 'none':
-                            # Audio-only format
-                            abr = fmt.get('abr', 0)
-                            acodec = fmt.get('acodec', '')
-                            more_info = fmt.get('format_note', '')
-                            quality_str = f"{abr}kbps ({more_info}) [{acodec}]"
-                            formats_data['audio'].append({
-                                'format_id': format_id,
-                                'display': quality_str
-                            })
-            
-            # Sort video formats by resolution (higher first)
-            formats_data['video'] = sorted(
-                formats_data['video'],
-                key=lambda x: x['display'],
-                reverse=True
-            )
-            
-            # Sort audio formats by bitrate (higher first)
-            formats_data['audio'] = sorted(
-                formats_data['audio'],
-                key=lambda x: x['display'],
-                reverse=True
-            )
-            
-            self.finished.emit(True, {'formats': formats_data, 'info': video_info}, "Formats fetched successfully")
+            data = fetch_formats(self.url, self.cache, self.force_refresh,
+                                 self.entries.emit, lambda: self.is_cancelled)
+            self.finished.emit(True, data, "Formats fetched successfully")
                 
         except Exception as e:
             self.finished.emit(False, {}, str(e))
\ No newline at end of file
@@ -0,0 +1,96 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from PyQt5.QtCore import QObject, pyqtSignal
+
+# Transcodes keep several cores busy each, so run about one per two cores
+MAX_POST_PROCESS_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+# Niceness of the workers, downloads and the window come first
+WORKER_NICENESS = 10
+
+
+def post_process_options(audio_format=None, optimize_video=False, add_metadata=False):
+    """
+    What PostProcessService does to a finished download: extract the audio
+    to `audio_format` (the video is removed), or re-encode the video, and
+    embed metadata and the thumbnail. None when there is nothing to do.
+    """
+    if not (audio_format or optimize_video or add_metadata):
+        return None
+    return {
+        'audio_format': audio_format,
+        'optimize_video': bool(optimize_video),
+        'add_metadata': bool(add_metadata),
+    }
+
+
+def _lower_priority():
+    if hasattr(os, 'nice'):
+        os.nice(WORKER_NICENESS)
+
+
+def _post_process(downloads, options, message):
+    """Runs in a worker process: yt-dlp's postprocessors over the files of one download"""
+    # yt-dlp errors carry tracebacks, which can't be pickled back to the GUI
+    try:
+        from utils.post_processors import post_process_downloads
+        if not post_process_downloads(downloads, options):
+            return True, f"{message} (post-processing skipped, ffmpeg not found)"
+        return True, message
+    except Exception as e:
+        return False, str(e)
+
+
+class PostProcessService(QObject):
+    """
+    Post-processes finished downloads on a pool of worker processes, so a
+    transcode runs alongside the next downloads instead of holding up the
+    queue, and doesn't compete with the window for the GIL.
+
+    Worker processes are only spawned with the first job and run at a
+    lower priority. Results arrive through `finished`.
+    """
+    finished = pyqtSignal(int, bool, str)  # job id, success, message
+
+    def __init__(self, max_workers=MAX_POST_PROCESS_WORKERS, parent=None):
+        super().__init__(parent)
+        self.max_workers = max_workers
+        self.executor = None
+        self.lock = threading.Lock()
+        self.futures = {}  # job id -> Future
+
+    def submit(self, job_id, downloads, options, message):
+        """Post-process the info dicts of the files job `job_id` wrote"""
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn'),
+                initializer=_lower_priority)
+        future = self.executor.submit(_post_process, downloads, options, message)
+        with self.lock:
+            self.futures[job_id] = future
+        future.add_done_callback(lambda f, job_id=job_id: self._deliver(job_id, f))
+
+    def cancel(self, job_id):
+        """Drop a job that hasn't started yet, False when it is already running"""
+        with self.lock:
+            future = self.futures.get(job_id)
+        return future is not None and future.cancel()
+
+    def shutdown(self):
+        # Running transcodes finish, the ones still waiting are dropped
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _deliver(self, job_id, future):
+        with self.lock:
+            self.futures.pop(job_id, None)
+        if future.cancelled():
+            success, message = False, "Download cancelled by user"
+        elif future.exception() is not None:
+            # The worker process died
+            success, message = False, f"Post-processing failed: {future.exception()}"
+        else:
+            success, message = future.result()
+        # Emitted from a pool thread, so receivers get it queued on their own thread
+        self.finished.emit(job_id, success, message)
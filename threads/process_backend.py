@@ -0,0 +1,294 @@
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from PyQt5.QtCore import QThread, Qt, pyqtSignal
+from threads.download_thread import DownloadThread
+from threads.fetch_thread import fetch_formats
+from utils.journal import JobJournal
+from utils.metadata_cache import MetadataCache
+from utils.rate_limiter import BandwidthLimiter
+
+# Enough workers for the largest concurrent download setting plus fetches.
+# Worker processes are only spawned when needed and are reused afterwards.
+MAX_WORKERS = 18
+# Seconds between checks of the worker and of the bandwidth share
+POLL_INTERVAL = 0.5
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class ProcessPool:
+    """
+    Worker processes for yt-dlp jobs, so extraction and fragment bookkeeping
+    don't compete with the Qt event loop for the GIL. Events between the GUI
+    and the workers go through queues hosted by a multiprocessing manager.
+    """
+    def __init__(self, max_workers=MAX_WORKERS):
+        context = multiprocessing.get_context('spawn')
+        self.manager = context.Manager()
+        self.executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.manager.shutdown()
+
+
+def get_process_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPool()
+        return _pool
+
+
+def shutdown_process_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+def _download_worker(url, download_path, format_id, max_connections,
+                     journal_file, journal_id, info, fetched_at, fragment_buffer_size,
+                     stream_merge, write_thumbnail, audio_transcode, events, control):
+    """Runs in a worker process: a DownloadThread driven without an event loop"""
+    journal = JobJournal(journal_file) if journal_file else None
+    limiter = BandwidthLimiter()
+    thread = DownloadThread(url, download_path, format_id, max_connections,
+                            journal, journal_id, limiter, info, fetched_at,
+                            fragment_buffer_size, stream_merge, write_thumbnail, audio_transcode)
+    # Progress comes from yt-dlp's worker threads as well. There is no event
+    # loop here to deliver queued signals, so the slots are called directly.
+    thread.progress.connect(lambda record: events.put(('progress', record)), Qt.DirectConnection)
+    thread.finished.connect(
+        lambda success, message: events.put(('finished', success, message, thread.downloads)),
+        Qt.DirectConnection)
+
+    def handle(message):
+        if message[0] == 'cancel':
+            thread.cancel_download()
+        elif message[0] == 'rates':
+            limiter.set_rates(message[1], message[2])
+        elif message[0] == 'connections':
+            thread.set_max_connections(message[1])
+
+    with _watching(control, handle):
+        thread.run()
+
+
+def _fetch_worker(url, cache_file, ttl, max_size, force_refresh, events, control):
+    """Runs in a worker process: fetch_formats, playlist pages sent as they arrive"""
+    cancelled = threading.Event()
+
+    def handle(message):
+        if message[0] == 'cancel':
+            cancelled.set()
+
+    with _watching(control, handle):
+        # yt-dlp errors carry tracebacks, which can't be pickled back to the GUI
+        try:
+            cache = MetadataCache(ttl, max_size, cache_file) if cache_file else None
+            data = fetch_formats(url, cache, force_refresh,
+                                 lambda page: events.put(('entries', page)), cancelled.is_set)
+            events.put(('finished', True, data, "Formats fetched successfully"))
+        except Exception as e:
+            events.put(('finished', False, {}, str(e)))
+
+
+@contextmanager
+def _watching(control, handle):
+    """Pass the messages arriving on `control` to `handle` while the block runs"""
+    done = threading.Event()
+
+    def watch_control():
+        while not done.is_set():
+            try:
+                message = control.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return  # The manager was shut down, nobody is left to send anything
+            handle(message)
+
+    watcher = threading.Thread(target=watch_control, daemon=True)
+    watcher.start()
+    try:
+        yield
+    finally:
+        done.set()
+        watcher.join()
+
+
+class ProcessDownloadThread(QThread):
+    """
+    Drop-in replacement for DownloadThread that runs the download in a
+    worker process and relays its progress/finished signals.
+
+    The shared BandwidthLimiter can't throttle another process directly, so
+    each worker gets an even share of the global cap, refreshed while it
+    runs as jobs come and go.
+    """
+    progress = pyqtSignal(dict)
+    finished = pyqtSignal(bool, str)
+
+    def __init__(self, url, download_path, format_id, max_concurrent_downloads=10,
+                 journal=None, journal_id=None, limiter=None, info=None, fetched_at=None,
+                 fragment_buffer_size=None, stream_merge=False, write_thumbnail=False,
+                 audio_transcode=None):
+        super().__init__()
+        self.url = url
+        self.info = info
+        self.fetched_at = fetched_at
+        self.download_path = download_path
+        self.format_id = format_id
+        self.max_concurrent_downloads = max_concurrent_downloads
+        self.journal = journal
+        self.journal_id = journal_id
+        self.limiter = limiter
+        self.fragment_buffer_size = fragment_buffer_size
+        self.stream_merge = stream_merge
+        self.write_thumbnail = write_thumbnail
+        self.audio_transcode = audio_transcode
+        self.downloads = []
+        self.is_cancelled = False
+        self.control = None
+        self.rates = None
+
+    def run(self):
+        if self.is_cancelled:
+            self.finished.emit(False, "Download cancelled by user")
+            return
+        if self.limiter:
+            self.limiter.register(self)
+        try:
+            pool = get_process_pool()
+            events = pool.manager.Queue()
+            self.control = pool.manager.Queue()
+            if self.is_cancelled:
+                self.control.put(('cancel',))
+            self.send_rates()
+
+            future = pool.executor.submit(
+                _download_worker, self.url, self.download_path, self.format_id,
+                self.max_concurrent_downloads,
+                self.journal.journal_file if self.journal else None, self.journal_id,
+                self.info, self.fetched_at, self.fragment_buffer_size, self.stream_merge,
+                self.write_thumbnail, self.audio_transcode, events, self.control
+            )
+
+            while True:
+                self.send_rates()
+                try:
+                    event = events.get(timeout=POLL_INTERVAL)
+                except queue.Empty:
+                    if future.done():
+                        # The worker died without reporting back
+                        error = future.exception()
+                        self.finished.emit(False, str(error) if error else "Download worker exited")
+                        return
+                    continue
+
+                if event[0] == 'progress':
+                    self.progress.emit(event[1])
+                elif event[0] == 'finished':
+                    self.downloads = event[3]
+                    self.finished.emit(event[1], event[2])
+                    return
+
+        except Exception as e:
+            self.finished.emit(False, str(e))
+        finally:
+            if self.limiter:
+                self.limiter.unregister(self)
+
+    def send_rates(self):
+        if not self.limiter:
+            return
+        rates = self.limiter.job_share()
+        if rates != self.rates:
+            self.rates = rates
+            self.control.put(('rates',) + rates)
+
+    def cancel_download(self):
+        self.is_cancelled = True
+        if self.control is not None:
+            self.control.put(('cancel',))
+
+    def set_max_connections(self, value):
+        self.max_concurrent_downloads = value
+        if self.control is not None:
+            self.control.put(('connections', value))
+
+
+class ProcessFetchThread(QThread):
+    """
+    Drop-in replacement for FetchThread that extracts in a worker process.
+    Playlist entries are relayed page by page as the worker reads them.
+
+    Cancelling tells the worker to stop reading entries and to skip
+    resolving the formats, and the thread stops waiting for it right away.
+    """
+    entries = pyqtSignal(list)
+    finished = pyqtSignal(bool, dict, str)
+
+    def __init__(self, url, cache=None, force_refresh=False):
+        super().__init__()
+        self.url = url
+        self.cache = cache
+        self.force_refresh = force_refresh
+        self.is_cancelled = False
+        self.control = None
+
+    def cancel(self):
+        self.is_cancelled = True
+        if self.control is not None:
+            self.control.put(('cancel',))
+
+    def run(self):
+        try:
+            cache = self.cache
+            pool = get_process_pool()
+            events = pool.manager.Queue()
+            self.control = pool.manager.Queue()
+            if self.is_cancelled:
+                self.control.put(('cancel',))
+            future = pool.executor.submit(
+                _fetch_worker, self.url,
+                cache.cache_file if cache else None,
+                cache.ttl if cache else None,
+                cache.max_size if cache else None,
+                self.force_refresh, events, self.control
+            )
+
+            while True:
+                if self.is_cancelled:
+                    # Frees the worker slot if the fetch hasn't started yet
+                    future.cancel()
+                    self.finished.emit(False, {}, "Fetch cancelled")
+                    return
+                try:
+                    event = events.get(timeout=POLL_INTERVAL)
+                except queue.Empty:
+                    if future.done():
+                        # The worker died without reporting back
+                        error = future.exception() if not future.cancelled() else None
+                        self.finished.emit(False, {}, str(error) if error else "Fetch worker exited")
+                        return
+                    continue
+
+                if event[0] == 'entries':
+                    if not self.is_cancelled:
+                        self.entries.emit(event[1])
+                elif event[0] == 'finished':
+                    if self.is_cancelled:
+                        self.finished.emit(False, {}, "Fetch cancelled")
+                    else:
+                        self.finished.emit(event[1], event[2], event[3])
+                    return
+
+        except Exception as e:
+            self.finished.emit(False, {}, str(e))
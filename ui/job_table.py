@@ -0,0 +1,238 @@
+from PyQt5.QtWidgets import (
+    QTableView, QHeaderView, QAbstractItemView, QStyledItemDelegate,
+    QStyleOptionProgressBar, QStyle, QApplication
+)
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QTimer
+from threads.download_queue import DownloadJob
+from utils.formatting import format_size, format_speed, format_eta
+
+
+class JobRow:
+    """What the table shows of one job, a few fields instead of the whole DownloadJob"""
+    __slots__ = ('job_id', 'title', 'state', 'percent', 'total_bytes', 'speed', 'eta', 'status')
+
+    def __init__(self, job):
+        self.job_id = job.job_id
+        self.title = (job.info or {}).get('title') or job.url
+        self.state = job.state
+        self.percent = job.percent
+        self.total_bytes = 0
+        self.speed = 0
+        self.eta = 0
+        self.status = job.status
+
+
+class JobTableModel(QAbstractTableModel):
+    """
+    Table of the jobs of a DownloadQueue, one row per job in the order they
+    were added.
+
+    Queue signals only update the rows; the view hears about it once per
+    UPDATE_INTERVAL, as one insertion for all new jobs and one dataChanged
+    per run of neighbouring changed rows (a single one spanning them all
+    when they are scattered). Adding thousands of jobs or running many at
+    once costs the view a handful of signals per tick.
+    """
+    UPDATE_INTERVAL = 250  # ms
+    MAX_RANGES = 32  # dataChanged signals per tick
+
+    TITLE, STATUS, PROGRESS, SIZE, SPEED, ETA = range(6)
+    HEADERS = ("Title", "Status", "Progress", "Size", "Speed", "ETA")
+
+    def __init__(self, download_queue, parent=None):
+        super().__init__(parent)
+        self.download_queue = download_queue
+        self.rows = []
+        self.row_of = {}  # job id -> row
+        self.added = []  # Rows not yet inserted into the view
+        self.changed = set()  # Rows the view hasn't been told about
+
+        self.update_timer = QTimer(self)
+        self.update_timer.setInterval(self.UPDATE_INTERVAL)
+        self.update_timer.timeout.connect(self.flush)
+
+        download_queue.job_added.connect(self.job_added)
+        download_queue.job_progress.connect(self.job_progress)
+        download_queue.job_status.connect(self.job_status)
+        download_queue.job_finished.connect(self.job_finished)
+
+    # Queue signals
+
+    def job_added(self, job_id):
+        self.row_of[job_id] = len(self.rows) + len(self.added)
+        self.added.append(JobRow(self.download_queue.get_job(job_id)))
+        self.schedule_update()
+
+    def job_progress(self, job_id, record):
+        row = self.find_row(job_id)
+        if row is None:
+            return
+        row.state = DownloadJob.RUNNING
+        row.percent = record.get('percent', 0.0)
+        row.total_bytes = record.get('total_bytes') or 0
+        row.speed = record.get('speed') or 0
+        row.eta = record.get('eta') or 0
+        row.status = "Downloading"
+        self.mark_changed(job_id)
+
+    def job_status(self, job_id, status):
+        row = self.find_row(job_id)
+        if row is None:
+            return
+        job = self.download_queue.get_job(job_id)
+        row.state = job.state
+        row.percent = job.percent
+        row.speed = row.eta = 0
+        row.status = status
+        self.mark_changed(job_id)
+
+    def job_finished(self, job_id, success, message):
+        row = self.find_row(job_id)
+        if row is None:
+            return
+        job = self.download_queue.get_job(job_id)
+        row.state = job.state
+        row.percent = job.percent
+        row.speed = row.eta = 0
+        row.status = "Completed" if success else message
+        self.mark_changed(job_id)
+
+    def find_row(self, job_id):
+        index = self.row_of.get(job_id)
+        if index is None:
+            return None
+        if index < len(self.rows):
+            return self.rows[index]
+        return self.added[index - len(self.rows)]  # Not in the view yet
+
+    def mark_changed(self, job_id):
+        index = self.row_of[job_id]
+        # Rows still waiting to be inserted are shown as they are then
+        if index < len(self.rows):
+            self.changed.add(index)
+            self.schedule_update()
+
+    def schedule_update(self):
+        if not self.update_timer.isActive():
+            self.update_timer.start()
+
+    def flush(self):
+        """Tell the view about everything that happened since the last tick"""
+        if self.changed:
+            changed = sorted(self.changed)
+            self.changed.clear()
+            ranges = []
+            first = last = changed[0]
+            for index in changed[1:] + [None]:
+                if index == last + 1:
+                    last = index
+                    continue
+                ranges.append((first, last))
+                if index is not None:
+                    first = last = index
+            if len(ranges) > self.MAX_RANGES:
+                # Scattered changes, one range over all of them is cheaper for the view
+                ranges = [(changed[0], changed[-1])]
+            for first, last in ranges:
+                self.dataChanged.emit(self.index(first, 0),
+                                      self.index(last, len(self.HEADERS) - 1))
+
+        if self.added:
+            start = len(self.rows)
+            self.beginInsertRows(QModelIndex(), start, start + len(self.added) - 1)
+            self.rows.extend(self.added)
+            self.added = []
+            self.endInsertRows()
+
+        if not self.download_queue.active_count():
+            self.update_timer.stop()
+
+    # QAbstractTableModel
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.rows[index.row()]
+        column = index.column()
+
+        if role == Qt.DisplayRole:
+            if column == self.TITLE:
+                return row.title
+            if column == self.STATUS:
+                return row.status
+            if column == self.PROGRESS:
+                return f"{row.percent:.1f}%"
+            if row.state != DownloadJob.RUNNING:
+                return ""
+            if column == self.SIZE:
+                return format_size(row.total_bytes)
+            if column == self.SPEED:
+                return format_speed(row.speed)
+            if column == self.ETA:
+                return format_eta(row.eta)
+        elif role == Qt.UserRole and column == self.PROGRESS:
+            return row.percent
+        elif role == Qt.ToolTipRole and column in (self.TITLE, self.STATUS):
+            return row.title if column == self.TITLE else row.status
+        return None
+
+
+class ProgressDelegate(QStyledItemDelegate):
+    """Paints the progress column as a bar, only for the rows on screen"""
+
+    def paint(self, painter, option, index):
+        percent = index.data(Qt.UserRole) or 0.0
+        bar = QStyleOptionProgressBar()
+        bar.rect = option.rect.adjusted(4, 4, -4, -4)
+        bar.minimum = 0
+        bar.maximum = 100
+        bar.progress = int(percent)
+        bar.text = index.data(Qt.DisplayRole)
+        bar.textVisible = True
+        bar.state = option.state
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawControl(QStyle.CE_ProgressBar, bar, painter, option.widget)
+
+
+class JobTableView(QTableView):
+    """
+    QTableView set up for many rows: fixed row heights and column widths,
+    so scrolling and updates only lay out and paint the visible rows.
+    """
+    ROW_HEIGHT = 28
+
+    def __init__(self, model, parent=None):
+        super().__init__(parent)
+        self.setObjectName("jobTable")
+        self.setModel(model)
+        self.setItemDelegateForColumn(JobTableModel.PROGRESS, ProgressDelegate(self))
+        self.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setShowGrid(False)
+        self.setWordWrap(False)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+
+        rows = self.verticalHeader()
+        rows.setVisible(False)
+        rows.setSectionResizeMode(QHeaderView.Fixed)
+        rows.setDefaultSectionSize(self.ROW_HEIGHT)
+
+        # Sizing columns to their contents would look at every row
+        columns = self.horizontalHeader()
+        columns.setSectionResizeMode(QHeaderView.Interactive)
+        columns.setSectionResizeMode(JobTableModel.TITLE, QHeaderView.Stretch)
+        for column, width in ((JobTableModel.STATUS, 110), (JobTableModel.PROGRESS, 100),
+                              (JobTableModel.SIZE, 80), (JobTableModel.SPEED, 90),
+                              (JobTableModel.ETA, 80)):
+            self.setColumnWidth(column, width)
@@ -1,15 +1,28 @@
+import threading
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, 
     QPushButton, QFileDialog, QFrame, QComboBox, QMessageBox,
-    QProgressBar
+    QProgressBar, QApplication, QListWidget, QListWidgetItem, QCheckBox
 )
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QFont
-from utils.settings import Settings
+from utils.settings import get_settings
+from utils.formatting import format_progress
+from utils.formats import FormatIndex, FormatQuery
+from utils.metadata_cache import MetadataCache
+from utils.notifications import Notification, NotificationCenter
+from utils.sounds import Sounds
+from utils.ydl_pool import shutdown_ydl_pool
 from .settings_window import SettingsWindow
-from threads.fetch_thread import FetchThread
-from threads.download_thread import DownloadThread
+from threads.fetch_thread import FetchThread, warm_up
+from threads.process_backend import ProcessFetchThread, shutdown_process_pool
+from threads.bulk_fetch import BulkFetchService, queue_fetched
+from threads.control_api import ControlApiServer, generate_token
+from threads.download_queue import DownloadQueue
+from threads.post_processing import post_process_options
 from .material_dialog import MaterialDialog
+from .notification_panel import NotificationPanel
+from .job_table import JobTableModel, JobTableView
 
 class YouTubeDownloader(QWidget):
     def __init__(self, default_url=None):
@@ -17,17 +30,50 @@ class YouTubeDownloader(QWidget):
         self.setWindowTitle("Stream Saver")
         self.setGeometry(300, 300, 600, 400)
         self.download_path = ""
-        self.download_thread = None
         self.fetch_thread = None
         self.format_data = None
-        self.settings = Settings()
+        self.fetched_url = None
+        self.stale_fetch_threads = []  # Replaced fetches still winding down
+        self.warmed_up = False
+        self.settings = get_settings()
+        self.metadata_cache = MetadataCache(
+            self.settings.get_metadata_cache_ttl() * 60,
+            self.settings.get_metadata_cache_size() * 1024 * 1024
+        )
+        self.download_queue = DownloadQueue(
+            self.settings.get_max_concurrent_downloads(),
+            self.settings.get_max_connections(),
+            parent=self
+        )
+        self.download_queue.job_progress.connect(self.update_job_progress)
+        self.download_queue.job_status.connect(self.update_job_status)
+        self.download_queue.job_finished.connect(self.download_finished)
+        self.download_queue.overall_progress.connect(self.update_progress)
+        self.job_model = JobTableModel(self.download_queue, parent=self)
+        self.bulk_fetch = BulkFetchService(cache=self.metadata_cache, parent=self)
+        self.bulk_fetch.result.connect(self.bulk_fetch_result)
+        self.bulk_fetch.idle.connect(self.bulk_fetch_finished)
+        self.bulk_keys = set()  # Videos already queued from the current bulk fetch
+        self.bulk_failures = []
+        self.control_api = None
+        self.notifications = NotificationCenter(parent=self)
+        self.notification_panel = None
         self.setup_ui()
         self.apply_material_styles()
         self.load_settings()  # Load settings
+        self.settings.changed.connect(self.setting_changed)
+        self.resume_interrupted_downloads()
         if default_url:
             self.url_input.setText(default_url)
             self.fetch_video_info()
 
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.warmed_up:
+            # The first frame is on screen, load yt-dlp while the user pastes a link
+            self.warmed_up = True
+            threading.Thread(target=warm_up, daemon=True).start()
+
     def setup_ui(self):
         main_layout = QVBoxLayout()
         main_layout.setContentsMargins(24, 24, 24, 24)
@@ -56,6 +102,17 @@ class YouTubeDownloader(QWidget):
         title_layout.addWidget(subtitle)
 
         header_layout.addLayout(title_layout)
+        header_layout.addStretch()
+
+        # Recent completions and errors, opens the activity panel
+        self.notifications_button = QPushButton("🔔")
+        self.notifications_button.setObjectName("iconButton")
+        self.notifications_button.setToolTip("Activity")
+        self.notifications_button.clicked.connect(self.open_notifications)
+        self.notifications_button.setMinimumWidth(40)
+        self.notifications_button.setMaximumHeight(40)
+        self.notifications.unread_changed.connect(self.update_notifications_button)
+        header_layout.addWidget(self.notifications_button)
         
         # Add settings button to the right
         self.settings_button = QPushButton("⚙️")  # Gear emoji
@@ -87,7 +144,7 @@ class YouTubeDownloader(QWidget):
         url_layout.addWidget(self.url_label)
 
         self.url_input = QLineEdit()
-        self.url_input.setPlaceholderText("https://www.youtube.com/watch?v=...")
+        self.url_input.setPlaceholderText("https://www.youtube.com/watch?v=... (or paste several links)")
         self.url_input.setObjectName("materialInput")
         self.url_input.setMinimumHeight(40)
         url_input_layout.addWidget(self.url_input)
@@ -97,6 +154,7 @@ class YouTubeDownloader(QWidget):
         self.fetch_button = QPushButton("Fetch")
         self.fetch_button.setObjectName("outlineButton")
         self.fetch_button.clicked.connect(self.fetch_video_info)
+        self.fetch_button.setToolTip("Shift+click to refresh cached video info")
         self.fetch_button.setMinimumHeight(40)
         self.fetch_button.setMinimumWidth(80)
         url_input_layout.addWidget(self.fetch_button)
@@ -138,11 +196,29 @@ class YouTubeDownloader(QWidget):
         self.audio_quality_combo.setObjectName("materialCombo")
         self.audio_quality_combo.setMinimumHeight(40)
         self.audio_quality_combo.setEnabled(False)
+        self.audio_quality_combo.currentIndexChanged.connect(self.on_audio_quality_changed)
         audio_quality_layout.addWidget(self.audio_quality_combo)
         
         quality_layout.addLayout(audio_quality_layout)
         
         card_layout.addLayout(quality_layout)
+
+        # Audio-only mode, for single videos and playlists alike
+        self.audio_only_checkbox = QCheckBox("Audio only")
+        self.audio_only_checkbox.setObjectName("materialCheckbox")
+        self.audio_only_checkbox.setToolTip(
+            "Download just the audio. With audio extraction on in the settings, it is "
+            "converted to the preferred audio format and tagged.")
+        self.audio_only_checkbox.toggled.connect(self.on_audio_only_changed)
+        card_layout.addWidget(self.audio_only_checkbox)
+
+        # Playlist entries (shows instead of the quality selection for playlists)
+        self.playlist_list = QListWidget()
+        self.playlist_list.setObjectName("playlistList")
+        self.playlist_list.setUniformItemSizes(True)
+        self.playlist_list.setMinimumHeight(160)
+        self.playlist_list.setVisible(False)
+        card_layout.addWidget(self.playlist_list)
         
         # Location selection
         location_layout = QHBoxLayout()
@@ -176,6 +252,13 @@ class YouTubeDownloader(QWidget):
         self.status_label = QLabel("Ready to fetch video info")
         self.status_label.setObjectName("statusLabel")
         main_layout.addWidget(self.status_label)
+
+        # Every job of the queue, shown once the first one is added
+        self.job_table = JobTableView(self.job_model)
+        self.job_table.setMinimumHeight(160)
+        self.job_table.setVisible(False)
+        self.job_model.rowsInserted.connect(lambda: self.job_table.setVisible(True))
+        main_layout.addWidget(self.job_table)
         
         # Action buttons
         buttons_layout = QHBoxLayout()
@@ -250,6 +333,21 @@ class YouTubeDownloader(QWidget):
                 border-bottom: 1px solid #dadce0;
             }}
             
+            QTableView#jobTable {{
+                border: 1px solid #dadce0;
+                border-radius: 8px;
+                background: {surface};
+                selection-background-color: #e8f0fe;
+                selection-color: {on_surface};
+            }}
+            
+            QListWidget#playlistList, QListWidget#notificationList {{
+                border: 1px solid #dadce0;
+                border-radius: 8px;
+                background: {surface};
+                padding: 4px;
+            }}
+            
             QLabel#statusLabel {{
                 font-size: 13px;
                 color: #5f6368;
@@ -357,38 +455,249 @@ class YouTubeDownloader(QWidget):
         """)
 
     def load_settings(self):
-        self.settings.load()
+        self.apply_download_location()
+        self.apply_download_limits()
+        self.apply_cache_limits()
+        self.apply_post_processing()
+        self.update_control_api()
+
+    def setting_changed(self, section, key, value):
+        """Apply a changed setting right away, running downloads included"""
+        if key == 'default_download_location':
+            self.apply_download_location()
+        elif key in ('max_concurrent_downloads', 'max_connections', 'use_process_pool',
+                     'global_rate_limit', 'per_job_rate_limit', 'fragment_buffer_size',
+                     'stream_merge'):
+            self.apply_download_limits()
+        elif key in ('metadata_cache_ttl', 'metadata_cache_size'):
+            self.apply_cache_limits()
+        elif key in ('post_process_audio', 'post_process_video', 'preferred_audio_format',
+                     'auto_add_metadata'):
+            self.apply_post_processing()
+        elif key in ('api_enabled', 'api_port'):
+            self.update_control_api()
+
+    def apply_download_location(self):
         self.download_path = self.settings.get_default_download_location()
         self.location_label.setText(self.download_path)
 
+    def apply_download_limits(self):
+        self.download_queue.set_max_concurrent(self.settings.get_max_concurrent_downloads())
+        self.download_queue.set_max_connections(self.settings.get_max_connections())
+        self.download_queue.set_use_process_pool(self.settings.get_use_process_pool())
+        self.download_queue.set_fragment_buffer_size(
+            self.settings.get_fragment_buffer_size() * 1024 * 1024)
+        self.download_queue.set_stream_merge(self.settings.get_stream_merge())
+        self.download_queue.set_rate_limits(
+            self.settings.get_global_rate_limit() * 1024,
+            self.settings.get_per_job_rate_limit() * 1024
+        )
+
+    def apply_post_processing(self):
+        audio_format = None
+        if self.settings.get_post_process_audio():
+            audio_format = self.settings.get_preferred_audio_format()
+        # Audio-only downloads are converted and tagged while they download
+        self.download_queue.set_audio_transcode(audio_format)
+        self.download_queue.set_post_processing(post_process_options(
+            audio_format, self.settings.get_post_process_video(),
+            self.settings.get_auto_add_metadata()))
+
+    def apply_cache_limits(self):
+        self.metadata_cache.set_limits(
+            self.settings.get_metadata_cache_ttl() * 60,
+            self.settings.get_metadata_cache_size() * 1024 * 1024
+        )
+
+    def update_control_api(self):
+        """Start, restart or stop the localhost control API to match the settings"""
+        enabled = self.settings.get_api_enabled()
+        port = self.settings.get_api_port()
+        if self.control_api and (not enabled or self.control_api.port != port):
+            self.control_api.stop()
+            self.control_api = None
+        if not enabled or self.control_api:
+            return
+
+        token = self.settings.get_api_token()
+        if not token:
+            token = generate_token()
+            self.settings.set_api_token(token)
+            self.settings.save()
+        self.control_api = ControlApiServer(
+            self.download_queue, lambda: self.download_path, token,
+            cache=self.metadata_cache, port=port, parent=self)
+        try:
+            self.control_api.start()
+        except OSError as e:
+            self.control_api.stop()
+            self.control_api = None
+            self.status_label.setText(f"Control API not available on port {port}: {e.strerror}")
+
+    def open_notifications(self):
+        if self.notification_panel is None:
+            self.notification_panel = NotificationPanel(self.notifications, self)
+        self.notification_panel.show()
+        self.notification_panel.raise_()
+        self.notification_panel.activateWindow()
+
+    def update_notifications_button(self, unread):
+        self.notifications_button.setText(f"🔔 {unread}" if unread else "🔔")
+
+    def notify(self, level, title, message, job_id=None):
+        """Record an event in the activity panel, never waits for the user"""
+        self.notifications.notify(level, title, message, job_id)
+        Sounds().play_system_sound("error" if level == Notification.ERROR else "info")
+
     # Add this method to open settings window
     def open_settings(self):
+        # Saved changes reach setting_changed, nothing to reload afterwards
         self.settings_window = SettingsWindow()
-        self.settings_window.closed.connect(self.load_settings)  # Reload settings when closed
         self.settings_window.exec_()
 
+    def resume_interrupted_downloads(self):
+        resumed = self.download_queue.resume_interrupted()
+        if resumed:
+            self.cancel_button.setEnabled(True)
+            self.status_label.setText(f"Resuming {len(resumed)} interrupted download(s)...")
+
     def fetch_video_info(self):
         url = self.url_input.text().strip()
         if not url:
             MaterialDialog.error(self, "Error", "Please enter a YouTube URL.")
             return
         
+        urls = url.split()
+        if len(urls) > 1:
+            self.url_input.clear()
+            self.fetch_many(urls)
+            return
+        
+        if self.fetch_thread and self.fetch_thread.isRunning():
+            # A playlist may still be streaming in, drop it for the new URL
+            self.fetch_thread.cancel()
+            self.fetch_thread.entries.disconnect()
+            self.fetch_thread.finished.disconnect()
+            self.stale_fetch_threads.append(self.fetch_thread)
+        self.stale_fetch_threads = [t for t in self.stale_fetch_threads if t.isRunning()]
+
         self.fetch_button.setEnabled(False)
+        self.format_data = None
+        self.playlist_list.clear()
+        self.playlist_list.setVisible(False)
+        self.video_quality_combo.setVisible(True)
+        self.audio_quality_combo.setVisible(True)
+        self.video_quality_label.setVisible(True)
+        self.audio_quality_label.setVisible(True)
         self.video_quality_combo.clear()
         self.audio_quality_combo.clear()
         self.download_button.setEnabled(False)
         self.video_title.setVisible(False)
-        self.status_label.setText("Fetching video information...")
-        self.progress_bar.setValue(0)
-        
-        self.fetch_thread = FetchThread(url)
+        if not self.download_queue.active_count():
+            # Progress bar and status belong to the queue while it is busy
+            self.status_label.setText("Fetching video information...")
+            self.progress_bar.setValue(0)
+        
+        self.fetched_url = url
+        force_refresh = bool(QApplication.keyboardModifiers() & Qt.ShiftModifier)
+        cache = self.metadata_cache if self.settings.get_metadata_cache_ttl() else None
+        fetch_class = ProcessFetchThread if self.settings.get_use_process_pool() else FetchThread
+        self.fetch_thread = fetch_class(url, cache, force_refresh)
+        self.fetch_thread.entries.connect(self.add_playlist_entries)
         self.fetch_thread.finished.connect(self.fetch_finished)
         self.fetch_thread.start()
     
+    def add_playlist_entries(self, entries):
+        if not self.playlist_list.isVisible():
+            self.playlist_list.setVisible(True)
+            self.video_quality_combo.setVisible(False)
+            self.audio_quality_combo.setVisible(False)
+            self.video_quality_label.setVisible(False)
+            self.audio_quality_label.setVisible(False)
+            # The first page is enough to start picking, allow a new fetch too
+            self.fetch_button.setEnabled(True)
+            self.download_button.setEnabled(True)
+
+        self.playlist_list.setUpdatesEnabled(False)
+        for entry in entries:
+            text = entry['title']
+            if entry.get('duration'):
+                duration = int(entry['duration'])
+                text = f"{text} ({duration // 60}:{duration % 60:02d})"
+            item = QListWidgetItem(text)
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(Qt.Checked)
+            item.setData(Qt.UserRole, entry['url'])
+            self.playlist_list.addItem(item)
+        self.playlist_list.setUpdatesEnabled(True)
+
+        if not self.download_queue.active_count():
+            self.status_label.setText(f"Loading playlist... {self.playlist_list.count()} videos")
+    
+    def open_url(self, url):
+        """Take a link handed over by another launch of the application"""
+        self.showNormal()
+        self.raise_()
+        self.activateWindow()
+        if not url:
+            return
+        busy = (self.fetch_thread and self.fetch_thread.isRunning()) or self.format_data
+        if busy and self.download_path:
+            # Keep what the user is looking at, queue the link in the background
+            self.fetch_many([url])
+        else:
+            self.url_input.setText(url)
+            self.fetch_video_info()
+
+    def fetch_many(self, urls):
+        """Fetch a pasted list of links in parallel and queue each one as it resolves"""
+        if not self.download_path:
+            MaterialDialog.error(self, "Error", "Please select a download location.")
+            return
+        if not self.bulk_fetch.pending_count():
+            self.bulk_keys = set()
+            self.bulk_failures = []
+        force_refresh = bool(QApplication.keyboardModifiers() & Qt.ShiftModifier)
+        self.bulk_fetch.submit(urls, force_refresh)
+        self.status_label.setText(f"Fetching {self.bulk_fetch.pending_count()} links...")
+
+    def bulk_fetch_result(self, url, key, success, data, message):
+        if not success:
+            self.bulk_failures.append(f"{url}: {message}")
+        elif key not in self.bulk_keys:
+            self.bulk_keys.add(key)
+            query = self.format_query()
+            if not queue_fetched(self.download_queue, url, data, query, self.download_path) \
+                    and 'playlist' not in data:
+                self.bulk_failures.append(f"{url}: No downloadable formats found")
+            self.cancel_button.setEnabled(self.download_queue.active_count() > 0)
+
+        pending = self.bulk_fetch.pending_count()
+        if pending and not self.download_queue.active_count():
+            self.status_label.setText(f"Fetching {pending} links...")
+
+    def bulk_fetch_finished(self):
+        if self.bulk_failures:
+            failures = self.bulk_failures
+            self.bulk_failures = []
+            for failure in failures:
+                self.notifications.notify(Notification.ERROR, "Could not fetch link", failure)
+            Sounds().play_system_sound("error")
+            if not self.download_queue.active_count():
+                self.status_label.setText(f"{len(failures)} link(s) could not be fetched, see Activity")
+
     def fetch_finished(self, success, data, message):
         self.fetch_button.setEnabled(True)
         
-        if success:
+        if success and 'playlist' in data:
+            self.format_data = data
+            self.video_title.setText(
+                f"Playlist: {data['info']['title']} ({data['playlist']['count']} videos)")
+            self.video_title.setVisible(True)
+            self.download_button.setEnabled(self.playlist_list.count() > 0)
+            if not self.download_queue.active_count():
+                self.status_label.setText("Select the videos to download")
+        elif success:
             self.format_data = data
             
             # Update video title
@@ -410,12 +719,37 @@ class YouTubeDownloader(QWidget):
             
             self.video_quality_combo.setEnabled(True)
             self.audio_quality_combo.setEnabled(True)
-            self.status_label.setText("Please select video quality")
+            self.status_label.setText("Please select audio quality" if self.audio_only_checkbox.isChecked()
+                                      else "Please select video quality")
+            self.preselect_formats(data)
+            self.on_audio_only_changed(self.audio_only_checkbox.isChecked())
         else:
-            MaterialDialog.error(self, "Error", message)
-            self.status_label.setText("Failed to fetch video information")
+            self.notify(Notification.ERROR, "Could not fetch video information",
+                        f"{self.fetched_url}\n{message}")
+            self.status_label.setText("Failed to fetch video information, see Activity")
     
+    def format_query(self):
+        """Query for the preferred video quality setting, or the best audio in audio-only mode"""
+        query = FormatQuery.from_preferred_quality(self.settings.get_preferred_video_quality())
+        query.audio_only = self.audio_only_checkbox.isChecked()
+        return query
+
+    def preselect_formats(self, data):
+        """Select the formats matching the preferred video quality setting, or the best audio"""
+        index = FormatIndex.from_info(data.get('info_dict'))
+        video, audio = index.select(self.format_query())
+        if video is None:
+            if audio is not None:
+                self.audio_quality_combo.setCurrentIndex(self.audio_quality_combo.findData(audio.format_id))
+            return
+        # Video first, changing it resets the audio selection
+        self.video_quality_combo.setCurrentIndex(self.video_quality_combo.findData(video.format_id))
+        if audio is not None:
+            self.audio_quality_combo.setCurrentIndex(self.audio_quality_combo.findData(audio.format_id))
+
     def on_video_quality_changed(self, index):
+        if self.audio_only_checkbox.isChecked():
+            return  # The video selection is kept for when the mode is switched off
         if index <= 0:
             self.download_button.setEnabled(False)
             return
@@ -433,6 +767,25 @@ class YouTubeDownloader(QWidget):
         # Enable download button
         self.download_button.setEnabled(True)
 
+    def on_audio_quality_changed(self, index):
+        if self.audio_only_checkbox.isChecked():
+            self.download_button.setEnabled(index > 0)
+
+    def on_audio_only_changed(self, checked):
+        if self.playlist_list.isVisible() or not self.audio_quality_combo.count():
+            return  # Nothing to pick from yet, the mode applies when downloading
+        self.audio_quality_combo.setItemText(
+            0, "Select audio quality" if checked else "Select audio quality (optional)")
+        if checked:
+            self.video_quality_combo.setEnabled(False)
+            self.audio_quality_combo.setEnabled(True)
+            if self.audio_quality_combo.currentIndex() <= 0 and self.audio_quality_combo.count() > 1:
+                self.audio_quality_combo.setCurrentIndex(1)  # Best first
+            self.on_audio_quality_changed(self.audio_quality_combo.currentIndex())
+        else:
+            self.video_quality_combo.setEnabled(True)
+            self.on_video_quality_changed(self.video_quality_combo.currentIndex())
+
     def choose_directory(self):
         path = QFileDialog.getExistingDirectory(self, "Select Download Folder")
         if path:
@@ -448,70 +801,117 @@ class YouTubeDownloader(QWidget):
             MaterialDialog.error(self, "Error", "Please select a download location.")
             return
         
+        if self.playlist_list.isVisible():
+            self.download_playlist()
+            return
+        
         # Get selected format IDs
         video_idx = self.video_quality_combo.currentIndex()
         audio_idx = self.audio_quality_combo.currentIndex()
         
-        if video_idx <= 0:
-            MaterialDialog.error(self, "Error", "Please select a video quality.")
+        if self.audio_only_checkbox.isChecked():
+            if audio_idx <= 0:
+                MaterialDialog.error(self, "Error", "Please select an audio quality.")
+                return
+            format_str = self.audio_quality_combo.itemData(audio_idx)
+        else:
+            if video_idx <= 0:
+                MaterialDialog.error(self, "Error", "Please select a video quality.")
+                return
+
+            video_format = self.video_quality_combo.itemData(video_idx)
+            audio_format = self.audio_quality_combo.itemData(audio_idx) if audio_idx > 0 else None
+
+            # Create format string for yt-dlp
+            format_str = video_format
+            if audio_format:
+                format_str = f"{video_format}+{audio_format}"
+
+        if not self.download_queue.active_count():
+            self.progress_bar.setValue(0)
+            self.status_label.setText("Starting download...")
+        self.cancel_button.setEnabled(True)
+        # Hand over the fetched info so the download skips a second extraction
+        info = None
+        fetched_at = None
+        if self.format_data and url == self.fetched_url:
+            info = self.format_data.get('info_dict')
+            fetched_at = self.format_data.get('fetched_at')
+        self.download_queue.add_job(url, format_str, self.download_path,
+                                    info=info, fetched_at=fetched_at)
+    
+    def download_playlist(self):
+        urls = []
+        for row in range(self.playlist_list.count()):
+            item = self.playlist_list.item(row)
+            if item.checkState() == Qt.Checked and item.data(Qt.UserRole):
+                urls.append(item.data(Qt.UserRole))
+        if not urls:
+            MaterialDialog.error(self, "Error", "Please select at least one video.")
             return
-        
-        video_format = self.video_quality_combo.itemData(video_idx)
-        audio_format = self.audio_quality_combo.itemData(audio_idx) if audio_idx > 0 else None
-        
-        # Create format string for yt-dlp
-        format_str = video_format
-        if audio_format:
-            format_str = f"{video_format}+{audio_format}"
 
-        self.download_button.setEnabled(False)
-        self.fetch_button.setEnabled(False)
+        # Formats are picked by yt-dlp when each entry starts downloading
+        format_str = self.format_query().to_selector()
+
+        if not self.download_queue.active_count():
+            self.progress_bar.setValue(0)
+            self.status_label.setText("Starting download...")
         self.cancel_button.setEnabled(True)
-        self.progress_bar.setValue(0)
-        self.status_label.setText("Starting download...")
-        
-        self.download_thread = DownloadThread(url, self.download_path, format_str, self.settings.get_max_connections())
-        self.download_thread.progress.connect(self.update_progress)
-        self.download_thread.finished.connect(self.download_finished)
-        self.download_thread.start()
+        for url in urls:
+            self.download_queue.add_job(url, format_str, self.download_path)
     
     def cancel_download(self):
         result = MaterialDialog.question(
             self,
             "Cancel Download",
-            "Are you sure you want to cancel the download?",
+            "Are you sure you want to cancel all downloads?",
             buttons=("Yes", "No"),
             default_button=1  # Default to "No"
         )
         if result != 2:  # Not "Yes"
             return
         
-        if self.download_thread and self.download_thread.isRunning():
-            self.status_label.setText("Cancelling download...")
-            self.download_thread.cancel_download()
+        if self.download_queue.active_count():
+            self.status_label.setText("Cancelling downloads...")
+            self.download_queue.cancel_all()
             self.cancel_button.setEnabled(False)
     
-    def update_progress(self, percent, status):
+    def update_job_progress(self, job_id, record):
+        # With a single job running show its detailed status line
+        if len(self.download_queue.running) == 1 and not self.download_queue.pending:
+            self.status_label.setText(format_progress(record))
+    
+    def update_job_status(self, job_id, status):
+        if self.download_queue.active_count() == 1:
+            self.status_label.setText(status)
+    
+    def update_progress(self, percent, running, queued):
         self.progress_bar.setValue(int(percent))
-        self.status_label.setText(status)
+        if running + queued > 1:
+            self.status_label.setText(
+                f"{percent:.1f}% ~ {running} downloading | {queued} queued")
     
-    def download_finished(self, success, message):
-        self.download_button.setEnabled(True)
-        self.fetch_button.setEnabled(True)
-        self.cancel_button.setEnabled(False)
+    def download_finished(self, job_id, success, message):
+        idle = self.download_queue.active_count() == 0
+        self.cancel_button.setEnabled(not idle)
+        url = self.download_queue.get_job(job_id).url
         
         if success:
-            MaterialDialog.info(self, "Success", message)
-            self.progress_bar.setValue(100)
-            self.status_label.setText("Download completed")
+            self.notify(Notification.SUCCESS, "Download completed", url, job_id)
+            if idle:
+                self.progress_bar.setValue(100)
+                self.status_label.setText("Download completed")
         else:
             # Only show error message if it wasn't cancelled by user
             if "cancelled by user" in message:
-                self.status_label.setText("Download cancelled")
-                self.progress_bar.setValue(0)
+                self.notifications.notify(Notification.INFO, "Download cancelled", url, job_id)
+                if idle:
+                    self.status_label.setText("Download cancelled")
+                    self.progress_bar.setValue(0)
             else:
-                MaterialDialog.error(self, "Error", message)
-                self.status_label.setText("Download failed")
+                self.notify(Notification.ERROR, "Download failed", f"{url}\n{message}", job_id)
+                if idle:
+                    self.status_label.setText("Download failed")
 
     def closeEvent(self, event):
         result = MaterialDialog.question(
@@ -524,6 +924,14 @@ class YouTubeDownloader(QWidget):
 
         if result == 2:  # "Yes"
             print("Window is closing. Performing cleanup...")
+            # Unfinished downloads stay journaled and resume on next start
+            self.bulk_fetch.shutdown()
+            if self.control_api:
+                self.control_api.stop()
+            self.download_queue.shutdown()
+            shutdown_process_pool()
+            shutdown_ydl_pool()
+            self.settings.flush()
             # You can call your custom callback here
             # self.my_on_close_callback()
             event.accept()
@@ -0,0 +1,73 @@
+import time
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QListWidget, QListWidgetItem
+)
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QColor, QFont
+from utils.notifications import Notification
+
+
+class NotificationPanel(QWidget):
+    """Non-modal window listing the recent notifications, newest first"""
+
+    LEVEL_STYLES = {
+        Notification.INFO: ("ℹ️", "#202124"),
+        Notification.SUCCESS: ("✅", "#188038"),
+        Notification.ERROR: ("❌", "#b00020"),
+    }
+
+    def __init__(self, center, parent=None):
+        super().__init__(parent, Qt.Window)
+        self.center = center
+        self.setWindowTitle("Stream Saver - Activity")
+        self.resize(480, 360)
+        self.setup_ui()
+        for notification in reversed(center.recent()):
+            self.add_notification(notification)
+        center.added.connect(self.add_notification)
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(16, 16, 16, 16)
+        layout.setSpacing(12)
+
+        header_layout = QHBoxLayout()
+        title_label = QLabel("Activity")
+        title_font = QFont()
+        title_font.setPointSize(14)
+        title_font.setBold(True)
+        title_label.setFont(title_font)
+        header_layout.addWidget(title_label)
+        header_layout.addStretch()
+
+        self.clear_button = QPushButton("Clear")
+        self.clear_button.setObjectName("outlineButton")
+        self.clear_button.setMinimumHeight(32)
+        self.clear_button.clicked.connect(self.clear)
+        header_layout.addWidget(self.clear_button)
+        layout.addLayout(header_layout)
+
+        self.list = QListWidget()
+        self.list.setObjectName("notificationList")
+        self.list.setWordWrap(True)
+        layout.addWidget(self.list)
+
+    def add_notification(self, notification):
+        icon, color = self.LEVEL_STYLES.get(notification.level, self.LEVEL_STYLES[Notification.INFO])
+        when = time.strftime("%H:%M:%S", time.localtime(notification.created_at))
+        item = QListWidgetItem(f"{icon} {when}  {notification.title}\n{notification.message}")
+        item.setForeground(QColor(color))
+        self.list.insertItem(0, item)
+        # Mirror the center's ring buffer
+        while self.list.count() > self.center.notifications.maxlen:
+            self.list.takeItem(self.list.count() - 1)
+        if self.isVisible():
+            self.center.mark_read()
+
+    def clear(self):
+        self.center.clear()
+        self.list.clear()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.center.mark_read()
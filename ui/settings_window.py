@@ -1,4 +1,4 @@
-from utils.settings import Settings
+from utils.settings import get_settings
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QDialog, 
     QPushButton, QFileDialog, QSpinBox, QCheckBox, QFrame,
@@ -6,6 +6,7 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtCore import Qt, pyqtSignal
 from PyQt5.QtGui import QFont
+from threads.control_api import generate_token
 
 
 class SettingsWindow(QDialog):
@@ -16,9 +17,8 @@ class SettingsWindow(QDialog):
         super().__init__(parent)
         self.setWindowTitle("Stream Saver - Settings")
         self.setGeometry(300, 300, 600, 400)
-        self.settings = Settings()
+        self.settings = get_settings()
         
-        self.load_settings()
         self.setup_ui()
         self.apply_material_styles()
         
@@ -100,6 +100,32 @@ class SettingsWindow(QDialog):
         
         theme_layout.addWidget(self.theme_combo)
         general_layout.addWidget(theme_group)
+
+        # Local control API
+        api_group = QGroupBox("Control API")
+        api_group.setObjectName("settingsGroup")
+        api_layout = QGridLayout(api_group)
+
+        self.api_enabled = QCheckBox("Let other programs on this computer add and manage downloads")
+        self.api_enabled.setObjectName("materialCheckbox")
+        self.api_enabled.setChecked(self.settings.get_api_enabled())
+        api_layout.addWidget(self.api_enabled, 0, 0, 1, 2)
+
+        api_layout.addWidget(QLabel("Port:"), 1, 0)
+        self.api_port = QSpinBox()
+        self.api_port.setObjectName("materialSpinBox")
+        self.api_port.setRange(1024, 65535)
+        self.api_port.setValue(self.settings.get_api_port())
+        self.api_port.setMinimumHeight(40)
+        api_layout.addWidget(self.api_port, 1, 1)
+
+        api_layout.addWidget(QLabel("Token:"), 2, 0)
+        self.api_token = QLabel(self.settings.get_api_token() or "Created when the API is enabled")
+        self.api_token.setObjectName("locationLabel")
+        self.api_token.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        api_layout.addWidget(self.api_token, 2, 1)
+
+        general_layout.addWidget(api_group)
         
         # Add stretch to push everything to the top
         general_layout.addStretch()
@@ -121,9 +147,87 @@ class SettingsWindow(QDialog):
         self.max_connections.setRange(1, 10)
         self.max_connections.setValue(self.settings.get_max_connections())
         self.max_connections.setMinimumHeight(40)
+        self.max_connections.setToolTip(
+            "Upper limit for parallel fragment downloads. The actual number is "
+            "tuned per download and remembered for each host.")
         connection_layout.addWidget(self.max_connections, 0, 1)
+
+        connection_layout.addWidget(QLabel("Concurrent Downloads:"), 1, 0)
+        self.max_concurrent_downloads = QSpinBox()
+        self.max_concurrent_downloads.setObjectName("materialSpinBox")
+        self.max_concurrent_downloads.setRange(1, 16)
+        self.max_concurrent_downloads.setValue(self.settings.get_max_concurrent_downloads())
+        self.max_concurrent_downloads.setMinimumHeight(40)
+        connection_layout.addWidget(self.max_concurrent_downloads, 1, 1)
+
+        # Speed limits are stored in KiB/s, 0 means unlimited
+        connection_layout.addWidget(QLabel("Total Speed Limit:"), 2, 0)
+        self.global_rate_limit = QSpinBox()
+        self.global_rate_limit.setObjectName("materialSpinBox")
+        self.global_rate_limit.setRange(0, 1000000)
+        self.global_rate_limit.setSingleStep(128)
+        self.global_rate_limit.setSuffix(" KiB/s")
+        self.global_rate_limit.setSpecialValueText("Unlimited")
+        self.global_rate_limit.setValue(self.settings.get_global_rate_limit())
+        self.global_rate_limit.setMinimumHeight(40)
+        connection_layout.addWidget(self.global_rate_limit, 2, 1)
+
+        connection_layout.addWidget(QLabel("Speed Limit per Download:"), 3, 0)
+        self.per_job_rate_limit = QSpinBox()
+        self.per_job_rate_limit.setObjectName("materialSpinBox")
+        self.per_job_rate_limit.setRange(0, 1000000)
+        self.per_job_rate_limit.setSingleStep(128)
+        self.per_job_rate_limit.setSuffix(" KiB/s")
+        self.per_job_rate_limit.setSpecialValueText("Unlimited")
+        self.per_job_rate_limit.setValue(self.settings.get_per_job_rate_limit())
+        self.per_job_rate_limit.setMinimumHeight(40)
+        connection_layout.addWidget(self.per_job_rate_limit, 3, 1)
+
+        connection_layout.addWidget(QLabel("Fragment Buffer:"), 4, 0)
+        self.fragment_buffer_size = QSpinBox()
+        self.fragment_buffer_size.setObjectName("materialSpinBox")
+        self.fragment_buffer_size.setRange(4, 1024)
+        self.fragment_buffer_size.setSingleStep(16)
+        self.fragment_buffer_size.setSuffix(" MiB")
+        self.fragment_buffer_size.setToolTip(
+            "HLS/DASH fragments a download may keep in memory while waiting to be written in order")
+        self.fragment_buffer_size.setValue(self.settings.get_fragment_buffer_size())
+        self.fragment_buffer_size.setMinimumHeight(40)
+        connection_layout.addWidget(self.fragment_buffer_size, 4, 1)
+
+        self.use_process_pool = QCheckBox("Run fetches and downloads in separate processes")
+        self.use_process_pool.setObjectName("materialCheckbox")
+        self.use_process_pool.setToolTip("Keeps the window responsive under heavy load")
+        self.use_process_pool.setChecked(self.settings.get_use_process_pool())
+        connection_layout.addWidget(self.use_process_pool, 5, 0, 1, 2)
         
         downloader_layout.addWidget(connection_group)
+
+        # Metadata cache settings
+        cache_group = QGroupBox("Video Info Cache")
+        cache_group.setObjectName("settingsGroup")
+        cache_layout = QGridLayout(cache_group)
+
+        cache_layout.addWidget(QLabel("Keep Entries For:"), 0, 0)
+        self.cache_ttl = QSpinBox()
+        self.cache_ttl.setObjectName("materialSpinBox")
+        self.cache_ttl.setRange(0, 7 * 24 * 60)
+        self.cache_ttl.setSuffix(" min")
+        self.cache_ttl.setSpecialValueText("Disabled")
+        self.cache_ttl.setValue(self.settings.get_metadata_cache_ttl())
+        self.cache_ttl.setMinimumHeight(40)
+        cache_layout.addWidget(self.cache_ttl, 0, 1)
+
+        cache_layout.addWidget(QLabel("Maximum Size:"), 1, 0)
+        self.cache_size = QSpinBox()
+        self.cache_size.setObjectName("materialSpinBox")
+        self.cache_size.setRange(1, 10000)
+        self.cache_size.setSuffix(" MB")
+        self.cache_size.setValue(self.settings.get_metadata_cache_size())
+        self.cache_size.setMinimumHeight(40)
+        cache_layout.addWidget(self.cache_size, 1, 1)
+
+        downloader_layout.addWidget(cache_group)
         
         # Post-processing settings
         post_process_group = QGroupBox("Post-Processing")
@@ -138,12 +242,19 @@ class SettingsWindow(QDialog):
         self.process_video.setObjectName("materialCheckbox")
         self.process_video.setChecked(self.settings.get_post_process_video())
         
+        self.stream_merge = QCheckBox("Merge video and audio while downloading")
+        self.stream_merge.setObjectName("materialCheckbox")
+        self.stream_merge.setToolTip(
+            "Needs ffmpeg. Saves the separate merge step, but an interrupted download starts over")
+        self.stream_merge.setChecked(self.settings.get_stream_merge())
+        
         self.add_metadata = QCheckBox("Automatically add metadata (title, artist, etc.)")
         self.add_metadata.setObjectName("materialCheckbox")
         self.add_metadata.setChecked(self.settings.get_auto_add_metadata())
         
         post_process_layout.addWidget(self.process_audio)
         post_process_layout.addWidget(self.process_video)
+        post_process_layout.addWidget(self.stream_merge)
         post_process_layout.addWidget(self.add_metadata)
         
         downloader_layout.addWidget(post_process_group)
@@ -389,23 +500,30 @@ class SettingsWindow(QDialog):
         if path:
             self.location_label.setText(path)
     
-    def load_settings(self):
-        try:
-            self.settings.load()
-        except Exception as e:
-            print(f"Error loading settings: {e}")
-    
     def save_settings(self):
 
         try:
             self.settings.set_default_download_location(self.location_label.text())
             self.settings.set_theme(self.theme_combo.currentData())
             self.settings.set_max_connections(self.max_connections.value())
+            self.settings.set_max_concurrent_downloads(self.max_concurrent_downloads.value())
+            self.settings.set_global_rate_limit(self.global_rate_limit.value())
+            self.settings.set_per_job_rate_limit(self.per_job_rate_limit.value())
+            self.settings.set_use_process_pool(self.use_process_pool.isChecked())
+            self.settings.set_fragment_buffer_size(self.fragment_buffer_size.value())
+            self.settings.set_metadata_cache_ttl(self.cache_ttl.value())
+            self.settings.set_metadata_cache_size(self.cache_size.value())
             self.settings.set_post_process_audio(self.process_audio.isChecked())
             self.settings.set_post_process_video(self.process_video.isChecked())
+            self.settings.set_stream_merge(self.stream_merge.isChecked())
             self.settings.set_auto_add_metadata(self.add_metadata.isChecked())
             self.settings.set_preferred_audio_format(self.audio_format.currentText())
             self.settings.set_preferred_video_quality(self.video_quality.currentData())
+            # Port first, so enabling the API doesn't start it on the old one
+            self.settings.set_api_port(self.api_port.value())
+            self.settings.set_api_enabled(self.api_enabled.isChecked())
+            if self.api_enabled.isChecked() and not self.settings.get_api_token():
+                self.settings.set_api_token(generate_token())
 
             self.settings.save()
 
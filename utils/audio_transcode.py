@@ -0,0 +1,125 @@
+import os
+from yt_dlp.networking import Request
+from yt_dlp.networking.exceptions import RequestError
+from yt_dlp.postprocessor.ffmpeg import ACODECS, EXT_TO_OUT_FORMATS, FFmpegPostProcessor
+from utils.formats import codec_matches
+from utils.stream_merge import STREAMABLE_CONTAINERS, STREAMABLE_EXTS, StreamingMergeFD
+
+# Protocol of audio-only formats handed to AudioTranscodeFD, which writes
+# the converted and tagged file instead of the format as it is served
+AUDIO_TRANSCODE_PROTOCOL = 'audio_transcode'
+# Audio files ffmpeg can read front to back, besides the streamable containers
+STREAMABLE_AUDIO_EXTS = ('mp3', 'ogg', 'oga', 'opus', 'weba', 'flac', 'wav', 'aac')
+# Target format -> source codec that is copied instead of encoded again
+COPY_CODECS = {
+    'mp3': 'mp3',
+    'm4a': 'mp4a',
+    'opus': 'opus',
+    'flac': 'flac',
+}
+# Target formats that can carry a cover image
+COVER_EXTS = ('mp3', 'm4a', 'flac')
+
+
+class AudioTranscodeError(Exception):
+    """ffmpeg could not convert the stream"""
+
+
+class AudioTranscodeFD(StreamingMergeFD):
+    """
+    Downloads an audio-only format straight into ffmpeg, which converts it
+    to the `audio_transcode` format (mp3, m4a, opus, flac or wav) and
+    writes the title, artist, album and cover tags in the same pass. The
+    served file never touches the disk and there is no conversion or
+    tagging pass after the download.
+
+    The cover is the thumbnail written next to the file when there is one,
+    otherwise it is downloaded into memory. Qualifying formats are the ones
+    StreamingMergeFD could stream, see can_transcode.
+    """
+    FD_NAME = 'audio transcode'
+
+    @staticmethod
+    def can_transcode(ydl, info_dict):
+        params = ydl.params
+        if params.get('audio_transcode') not in ACODECS or os.name != 'posix' or \
+                info_dict.get('requested_formats'):
+            return False
+        if params.get('allow_unplayable_formats') or params.get('external_downloader') or \
+                info_dict.get('section_start') or info_dict.get('section_end'):
+            return False
+        if info_dict.get('vcodec') != 'none' or info_dict.get('acodec') in (None, 'none'):
+            return False  # Not an audio-only format
+        if info_dict.get('protocol') not in ('http', 'https') or info_dict.get('request_data') or \
+                'Range' in (info_dict.get('http_headers') or {}):
+            return False
+        if info_dict.get('container') not in STREAMABLE_CONTAINERS and \
+                info_dict.get('ext') not in STREAMABLE_EXTS + STREAMABLE_AUDIO_EXTS:
+            return False
+        return FFmpegPostProcessor(ydl).available
+
+    @staticmethod
+    def target_ext(audio_format):
+        return ACODECS[audio_format][0]
+
+    def input_formats(self, info_dict):
+        return [info_dict]
+
+    def attachments(self, info_dict):
+        if info_dict['ext'] not in COVER_EXTS:
+            return []
+        cover = self.read_cover(info_dict)
+        return [cover] if cover else []
+
+    def output_args(self, info_dict, formats, attachments):
+        audio_format = self.params['audio_transcode']
+        ext, encoder, _ = ACODECS[audio_format]
+        args = ['-map', '0:a:0', '-map_metadata', '-1']
+        if codec_matches(info_dict.get('acodec'), COPY_CODECS.get(audio_format)):
+            args += ['-c:a', 'copy']
+        elif encoder:
+            args += ['-c:a', encoder]
+        if attachments:
+            args += ['-map', '1:v:0', '-c:v', 'mjpeg', '-disposition:v', 'attached_pic',
+                     '-metadata:s:v', 'title=Album cover', '-metadata:s:v', 'comment=Cover (front)']
+        if ext == 'mp3':
+            args += ['-id3v2_version', '3', '-write_id3v1', '1']
+        for name, value in self.tags(info_dict).items():
+            args += ['-metadata', f'{name}={value}']
+        return args + ['-f', EXT_TO_OUT_FORMATS.get(ext, ext)]
+
+    def ffmpeg_error(self, detail):
+        return AudioTranscodeError(f'ffmpeg could not convert the audio: {detail}')
+
+    @staticmethod
+    def tags(info_dict):
+        artists = info_dict.get('artists') or info_dict.get('creators')
+        tags = {
+            'title': info_dict.get('track') or info_dict.get('title'),
+            'artist': ', '.join(artists) if artists else
+            info_dict.get('uploader') or info_dict.get('channel'),
+            'album': info_dict.get('album'),
+            'date': info_dict.get('release_date') or info_dict.get('upload_date'),
+            'comment': info_dict.get('webpage_url'),
+        }
+        return {name: value for name, value in tags.items() if value}
+
+    def read_cover(self, info_dict):
+        """Thumbnail bytes, None when there is no thumbnail to be had"""
+        for thumbnail in reversed(info_dict.get('thumbnails') or []):
+            path = thumbnail.get('filepath')
+            if path and os.path.isfile(path):
+                with open(path, 'rb') as f:
+                    return f.read()
+        url = info_dict.get('thumbnail')
+        if not url:
+            return None
+        try:
+            response = self.ydl.urlopen(Request(url))
+            try:
+                return response.read()
+            finally:
+                response.close()
+        except RequestError as e:
+            self.report_warning(f'Unable to download the cover, tagging without it: {e}')
+            return None
@@ -0,0 +1,84 @@
+import threading
+import time
+from urllib.parse import urlparse
+
+def host_key(url):
+    """Group CDN hosts by domain, e.g. rr3---sn-abc.googlevideo.com -> googlevideo.com"""
+    hostname = urlparse(url or '').hostname or ''
+    return '.'.join(hostname.split('.')[-2:])
+
+
+class FragmentAutotuner:
+    """
+    Tunes concurrent_fragment_downloads for a download from the throughput
+    and error rate seen in the progress hook.
+
+    Every `window` seconds the last window is scored: any throttling error
+    halves the parallelism, otherwise it keeps climbing by one connection
+    while throughput improves and steps back once it stops improving.
+    HLS and DASH downloads pick a new value up before their next fragment,
+    other downloads from the next stream of the job (e.g. the audio part of
+    a merge).
+    """
+    # Throughput has to grow by this factor for an increase to be kept
+    MIN_GAIN = 1.05
+
+    def __init__(self, start, minimum=1, maximum=10, window=5.0):
+        self.lock = threading.Lock()
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.value = min(max(start, self.minimum), self.maximum)
+        self.window = window
+        self.window_start = time.monotonic()
+        self.window_bytes = 0
+        self.window_errors = 0
+        self.window_fragments = 0
+        self.last_throughput = None
+        self.last_increase = False
+        self.settled = False
+
+    def set_maximum(self, maximum):
+        with self.lock:
+            self.maximum = max(self.minimum, maximum)
+            self.value = min(self.value, self.maximum)
+
+    def record_bytes(self, amount, fragment_done=False):
+        with self.lock:
+            self.window_bytes += max(0, amount)
+            if fragment_done:
+                self.window_fragments += 1
+            self._evaluate()
+
+    def record_error(self):
+        with self.lock:
+            self.window_errors += 1
+
+    def _evaluate(self):
+        now = time.monotonic()
+        elapsed = now - self.window_start
+        # Wait for a full window with at least a couple of fragments in it
+        if elapsed < self.window or (self.window_fragments < 2 and not self.window_errors):
+            return
+
+        throughput = self.window_bytes / elapsed
+        if self.window_errors:
+            self.value = max(self.minimum, self.value // 2)
+            self.settled = False
+            self.last_increase = False
+        elif self.last_increase and self.last_throughput and \
+                throughput < self.last_throughput * self.MIN_GAIN:
+            # The extra connection did not pay off
+            self.value = max(self.minimum, self.value - 1)
+            self.settled = True
+            self.last_increase = False
+        elif not self.settled and self.value < self.maximum:
+            self.value += 1
+            self.last_increase = True
+        else:
+            self.last_increase = False
+
+        self.last_throughput = throughput
+        self.window_start = now
+        self.window_bytes = 0
+        self.window_errors = 0
+        self.window_fragments = 0
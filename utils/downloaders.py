@@ -0,0 +1,100 @@
+from yt_dlp import YoutubeDL
+from yt_dlp.downloader import get_suitable_downloader
+from yt_dlp.downloader.dash import DashSegmentsFD
+from yt_dlp.downloader.hls import HlsFD
+from yt_dlp.downloader.http import HttpFD
+from yt_dlp.postprocessor.ffmpeg import FFmpegMergerPP
+from utils.audio_transcode import AUDIO_TRANSCODE_PROTOCOL, AudioTranscodeFD
+from utils.fragment_writer import BufferedDashSegmentsFD, BufferedHlsFD
+from utils.segmented_download import SegmentedHttpFD
+from utils.stream_merge import STREAM_MERGE_PROTOCOL, StreamingMergeFD, StreamMergeError
+
+# yt-dlp downloaders and what pooled instances use in their place
+DOWNLOADERS = {
+    HttpFD: SegmentedHttpFD,
+    HlsFD: BufferedHlsFD,
+    DashSegmentsFD: BufferedDashSegmentsFD,
+}
+
+
+class PooledYoutubeDL(YoutubeDL):
+    """
+    YoutubeDL that hands HTTP, HLS and DASH downloads to the app's own
+    downloaders.
+
+    With the `stream_merge` option, a video-only plus audio-only format
+    pair StreamingMergeFD can handle is given STREAM_MERGE_PROTOCOL, so
+    yt-dlp passes the pair to dl() in one piece instead of downloading
+    the formats one by one, and the merge postprocessor is skipped.
+
+    With the `audio_transcode` option set to an audio format, an
+    audio-only format AudioTranscodeFD can handle is given
+    AUDIO_TRANSCODE_PROTOCOL and the extension of that format, so the file
+    is named for what AudioTranscodeFD writes.
+    """
+
+    def process_info(self, info_dict):
+        if StreamingMergeFD.can_merge(self, info_dict):
+            info_dict['protocol'] = STREAM_MERGE_PROTOCOL
+        elif AudioTranscodeFD.can_transcode(self, info_dict):
+            info_dict['protocol'] = AUDIO_TRANSCODE_PROTOCOL
+            info_dict['ext'] = AudioTranscodeFD.target_ext(self.params['audio_transcode'])
+            # The served container is gone, and with it the fixups it would need
+            info_dict.pop('container', None)
+        return super().process_info(info_dict)
+
+    def dl(self, name, info, subtitle=False, test=False):
+        if test or subtitle or name == '-' or not info.get('url'):
+            return super().dl(name, info, subtitle, test)
+        if info.get('protocol') == STREAM_MERGE_PROTOCOL:
+            return self.stream_merge(name, info)
+        if info.get('protocol') == AUDIO_TRANSCODE_PROTOCOL:
+            return self.audio_transcode(name, info)
+        fd_class = DOWNLOADERS.get(get_suitable_downloader(info, self.params))
+        if fd_class is None:
+            return super().dl(name, info, subtitle, test)
+        return self.run_downloader(fd_class, name, info)
+
+    def stream_merge(self, name, info):
+        try:
+            result = self.run_downloader(StreamingMergeFD, name, info)
+        except StreamMergeError as e:
+            self.report_warning(f'{e}. Downloading the formats separately')
+            return self.dl_separately(info)
+        info['__stream_merged'] = True
+        return result
+
+    def audio_transcode(self, name, info):
+        success, real_download = self.run_downloader(AudioTranscodeFD, name, info)
+        if success:
+            # The cover is in the file now, drop the image like EmbedThumbnailPP does
+            self._delete_downloaded_files(
+                *(t.get('filepath') for t in info.get('thumbnails') or ()), info=info)
+        return success, real_download
+
+    def dl_separately(self, info):
+        """What yt-dlp does for a format pair: one file per format, merged afterwards"""
+        success, real_download = True, False
+        for f in info['requested_formats']:
+            new_info = dict(info)
+            del new_info['requested_formats']
+            new_info.update(f)
+            partial_success, partial_real_download = self.dl(f['filepath'], new_info)
+            success = success and partial_success
+            real_download = real_download or partial_real_download
+        return success, real_download
+
+    def run_pp(self, pp, infodict):
+        if isinstance(pp, FFmpegMergerPP) and infodict.get('__stream_merged'):
+            return infodict  # Merged while downloading
+        return super().run_pp(pp, infodict)
+
+    def run_downloader(self, fd_class, name, info):
+        fd = fd_class(self, self.params)
+        for ph in self._progress_hooks:
+            fd.add_progress_hook(ph)
+        self.write_debug(f'Invoking {fd.FD_NAME} downloader on "{info["url"]}"')
+        new_info = self._copy_infodict(info)
+        if new_info.get('http_headers') is None:
+            new_info['http_headers'] = self._calc_headers(new_info)
+        return fd.download(name, new_info)
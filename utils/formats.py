@@ -0,0 +1,246 @@
+import re
+
+# Codec aliases accepted by the query API
+CODEC_ALIASES = {
+    'h264': 'avc1',
+    'avc': 'avc1',
+    'h265': 'hev1',
+    'hevc': 'hev1',
+    'vp9': 'vp09',
+    'av1': 'av01',
+    'aac': 'mp4a',
+}
+
+
+def _number(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def codec_matches(codec, wanted):
+    """Match 'av01.0.08M.08' against 'av01', 'av1', 'vp9' (vp09/vp9), etc."""
+    if not codec or not wanted:
+        return False
+    codec = codec.lower()
+    wanted = wanted.lower()
+    wanted = CODEC_ALIASES.get(wanted, wanted)
+    if codec.startswith(wanted):
+        return True
+    # yt-dlp reports VP9 as either "vp9" or "vp09..."
+    return wanted == 'vp09' and codec.startswith('vp9')
+
+
+class Format:
+    """One entry of a video's format list with numeric fields for sorting"""
+    VIDEO_AUDIO = 'video_audio'
+    VIDEO = 'video'
+    AUDIO = 'audio'
+    OTHER = 'other'  # Neither video nor audio, e.g. storyboards
+
+    __slots__ = (
+        'format_id', 'kind', 'ext', 'protocol', 'height', 'width', 'fps',
+        'vcodec', 'acodec', 'tbr', 'vbr', 'abr', 'filesize', 'display', 'sort_key'
+    )
+
+    def __init__(self, fmt):
+        # A missing codec means unknown, only 'none' means absent
+        vcodec = fmt.get('vcodec')
+        acodec = fmt.get('acodec')
+        if vcodec != 'none' and acodec != 'none':
+            self.kind = Format.VIDEO_AUDIO
+        elif vcodec != 'none':
+            self.kind = Format.VIDEO
+        elif acodec != 'none':
+            self.kind = Format.AUDIO
+        else:
+            self.kind = Format.OTHER
+
+        self.format_id = fmt.get('format_id', '')
+        self.ext = fmt.get('ext', '')
+        self.protocol = fmt.get('protocol', '')
+        self.height = int(_number(fmt.get('height')))
+        self.width = int(_number(fmt.get('width')))
+        self.fps = _number(fmt.get('fps'))
+        self.vcodec = vcodec
+        self.acodec = acodec
+        self.tbr = _number(fmt.get('tbr'))
+        self.vbr = _number(fmt.get('vbr'))
+        self.abr = _number(fmt.get('abr'))
+        self.filesize = int(_number(fmt.get('filesize') or fmt.get('filesize_approx')))
+
+        resolution = fmt.get('resolution', '')
+        if self.kind == Format.VIDEO_AUDIO:
+            self.display = f"{resolution} [{vcodec}] [{acodec}] [{fmt.get('tbr', 0)}kbps] (With Audio)"
+            self.sort_key = (self.height, self.fps, self.tbr)
+        elif self.kind == Format.VIDEO:
+            self.display = f"{resolution} [{vcodec}] [{fmt.get('vbr', 0)}kbps]"
+            self.sort_key = (self.height, self.fps, self.vbr or self.tbr)
+        else:
+            self.display = f"{fmt.get('abr', 0)}kbps ({fmt.get('format_note', '')}) [{acodec}]"
+            self.sort_key = (self.abr or self.tbr, 0, 0)
+
+    @property
+    def has_video(self):
+        return self.kind in (Format.VIDEO_AUDIO, Format.VIDEO)
+
+    def __repr__(self):
+        return f"<Format {self.format_id} {self.kind} {self.display}>"
+
+
+class FormatQuery:
+    """
+    Selection rules for FormatIndex.select, e.g. parsed from
+    "height<=1080,vcodec=av01,abr>=128".
+
+    Limits filter formats out. A preferred video codec wins among formats of
+    the same height and frame rate, a preferred audio codec among the audio
+    formats that meet min_abr.
+    """
+    __slots__ = ('max_height', 'min_height', 'max_fps', 'vcodec', 'acodec',
+                 'min_abr', 'ext', 'audio_only')
+
+    RULE_PATTERN = re.compile(r'^\s*(\w+)\s*(<=|>=|=)\s*(\S+)\s*$')
+
+    def __init__(self, max_height=None, min_height=None, max_fps=None, vcodec=None,
+                 acodec=None, min_abr=None, ext=None, audio_only=False):
+        self.max_height = max_height
+        self.min_height = min_height
+        self.max_fps = max_fps
+        self.vcodec = vcodec
+        self.acodec = acodec
+        self.min_abr = min_abr
+        self.ext = ext
+        self.audio_only = audio_only
+
+    @classmethod
+    def parse(cls, text):
+        """Build a query from comma separated rules like 'height<=720,vcodec=vp9'"""
+        query = cls()
+        for rule in filter(None, (part.strip() for part in (text or '').split(','))):
+            if rule in ('best', 'bestvideo'):
+                continue
+            if rule in ('audio', 'audio_only', 'bestaudio'):
+                query.audio_only = True
+                continue
+            match = cls.RULE_PATTERN.match(rule)
+            if not match:
+                raise ValueError(f"Invalid format rule: {rule}")
+            field, op, value = match.groups()
+            if field in ('height', 'fps', 'abr'):
+                value = value.rstrip('pPkK')  # Allow "1080p" and "128k"
+            if (field, op) == ('height', '<='):
+                query.max_height = int(value)
+            elif (field, op) == ('height', '>='):
+                query.min_height = int(value)
+            elif (field, op) == ('fps', '<='):
+                query.max_fps = float(value)
+            elif (field, op) == ('abr', '>='):
+                query.min_abr = float(value)
+            elif (field, op) == ('vcodec', '='):
+                query.vcodec = value
+            elif (field, op) == ('acodec', '='):
+                query.acodec = value
+            elif (field, op) == ('ext', '='):
+                query.ext = value
+            else:
+                raise ValueError(f"Unsupported format rule: {rule}")
+        return query
+
+    def to_selector(self):
+        """
+        Equivalent yt-dlp format selector, for jobs queued before their
+        format list is known. Codec preferences need the format list to
+        rank formats and are left out.
+        """
+        # "?" lets formats with unknown values through, as FormatIndex does
+        video_filters = ''
+        if self.max_height is not None:
+            video_filters += f"[height<=?{self.max_height}]"
+        if self.min_height is not None:
+            video_filters += f"[height>=?{self.min_height}]"
+        if self.max_fps is not None:
+            video_filters += f"[fps<=?{self.max_fps:g}]"
+        if self.ext is not None:
+            video_filters += f"[ext={self.ext}]"
+        audio_filters = f"[abr>=?{self.min_abr:g}]" if self.min_abr is not None else ''
+
+        if self.audio_only:
+            choices = [f"bestaudio{audio_filters}", "bestaudio"]
+        else:
+            choices = [f"bestvideo{video_filters}+bestaudio{audio_filters}",
+                       f"bestvideo{video_filters}+bestaudio",
+                       f"best{video_filters}"]
+        # Without filters some fallbacks repeat the first choice
+        return '/'.join(dict.fromkeys(choices))
+
+    @classmethod
+    def from_preferred_quality(cls, quality):
+        """Query for the preferred_video_quality setting ('best', '720', ...)"""
+        if quality and str(quality).isdigit():
+            return cls(max_height=int(quality))
+        return cls()
+
+
+class FormatIndex:
+    """Formats of one video, kept sorted best first and queryable"""
+
+    def __init__(self, formats):
+        formats = [Format(fmt) for fmt in formats or []]
+        self.video = sorted((f for f in formats if f.has_video),
+                            key=lambda f: f.sort_key, reverse=True)
+        self.audio = sorted((f for f in formats if f.kind == Format.AUDIO),
+                            key=lambda f: f.sort_key, reverse=True)
+        self.by_id = {f.format_id: f for f in formats}
+
+    @classmethod
+    def from_info(cls, info_dict):
+        return cls((info_dict or {}).get('formats'))
+
+    def get(self, format_id):
+        return self.by_id.get(format_id)
+
+    def best_video(self, query):
+        candidates = [
+            f for f in self.video
+            if (query.max_height is None or f.height <= query.max_height)
+            and (query.min_height is None or f.height >= query.min_height)
+            and (query.max_fps is None or f.fps <= query.max_fps)
+            and (query.ext is None or f.ext == query.ext)
+        ]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda f: (
+            f.height, f.fps, codec_matches(f.vcodec, query.vcodec), f.sort_key[2]))
+
+    def best_audio(self, query):
+        candidates = [f for f in self.audio
+                      if query.min_abr is None or f.abr >= query.min_abr]
+        # Fall back to the best available audio rather than none at all
+        candidates = candidates or self.audio
+        if not candidates:
+            return None
+        return max(candidates, key=lambda f: (
+            codec_matches(f.acodec, query.acodec), f.sort_key))
+
+    def select(self, query):
+        """
+        Pick formats for `query` and return (video, audio). Either can be
+        None: video for audio-only queries, audio when the video format
+        already contains audio.
+        """
+        if query.audio_only:
+            return None, self.best_audio(query)
+        video = self.best_video(query)
+        if video is None:
+            return None, None
+        if video.kind == Format.VIDEO_AUDIO:
+            return video, None
+        return video, self.best_audio(query)
+
+    def format_string(self, query):
+        """yt-dlp format string for `query`, or None if nothing matches"""
+        video, audio = self.select(query)
+        ids = [f.format_id for f in (video, audio) if f is not None]
+        return '+'.join(ids) or None
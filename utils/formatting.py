@@ -0,0 +1,39 @@
+def format_size(size):
+    """Format a byte count as Bytes/KiB/MiB/GiB"""
+    if not size:
+        return "calculating..."
+    if size > 1024 * 1024 * 1024:
+        return f"{size/1024/1024/1024:.2f} GiB"
+    elif size > 1024 * 1024:
+        return f"{size/1024/1024:.2f} MiB"
+    elif size > 1024:
+        return f"{size/1024:.2f} KiB"
+    return f"{size:.2f} Bytes"
+
+
+def format_speed(speed):
+    """Format a transfer rate in bytes per second"""
+    if not speed:
+        return "calculating..."
+    return f"{format_size(speed)}/s"
+
+
+def format_eta(eta):
+    """Format a number of seconds as (seconds or minutes seconds or hours minutes)"""
+    if not eta:
+        return "calculating..."
+    eta = int(eta)
+    if eta > 3600:
+        return f"ETA: {eta//3600}h {eta%3600//60}m"
+    elif eta > 60:
+        return f"ETA: {eta//60}m {eta%60}s"
+    return f"ETA: {eta}s"
+
+
+def format_progress(record):
+    """Build the status line for a progress record emitted by DownloadThread"""
+    percent = record.get('percent', 0)
+    size_str = format_size(record.get('total_bytes'))
+    speed_str = format_speed(record.get('speed'))
+    eta_str = format_eta(record.get('eta'))
+    return f"{percent:.1f}% ~ {size_str} | {speed_str} | {eta_str}"
@@ -0,0 +1,292 @@
+import math
+import os
+import threading
+from yt_dlp.downloader.dash import DashSegmentsFD
+from yt_dlp.downloader.hls import HlsFD
+from yt_dlp.networking import Request
+from yt_dlp.networking.exceptions import IncompleteRead, RequestError
+from yt_dlp.utils import RetryManager, int_or_none
+from yt_dlp.utils.networking import HTTPHeaderDict
+
+# Fragment bytes a download may hold in memory unless the job sets its own cap
+FRAGMENT_BUFFER_SIZE = 64 * 1024 * 1024
+# Bytes read from a connection at a time
+READ_SIZE = 64 * 1024
+
+
+class _Stopped(Exception):
+    """Raised in the fragment workers once the download has ended"""
+
+
+class ReorderBuffer:
+    """
+    Fragments downloaded ahead of the writer, waiting for their turn.
+
+    Bytes are reserved while they arrive. A download that would go over
+    `capacity` waits, unless it is the fragment the writer needs next, so
+    the buffer can't deadlock and never holds more than `capacity` bytes
+    plus that one fragment.
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.condition = threading.Condition()
+        self.used = 0
+        self.fragments = {}  # position -> (fragment, content, reserved bytes)
+        self.next_position = 0  # Position the writer waits for
+        self.total = None  # Number of fragments, once all were handed out
+        self.error = None
+
+    def reserve(self, position, size):
+        with self.condition:
+            while self.error is None and position != self.next_position and \
+                    self.used + size > self.capacity:
+                self.condition.wait()
+            if self.error is not None:
+                raise _Stopped()
+            self.used += size
+
+    def release(self, size):
+        with self.condition:
+            self.used -= size
+            self.condition.notify_all()
+
+    def put(self, position, fragment, content, size):
+        with self.condition:
+            self.fragments[position] = (fragment, content, size)
+            self.condition.notify_all()
+
+    def end(self, total):
+        with self.condition:
+            self.total = total
+            self.condition.notify_all()
+
+    def take(self):
+        """Next fragment in order, None after the last one"""
+        with self.condition:
+            while self.error is None and self.next_position not in self.fragments and \
+                    self.next_position != self.total:
+                self.condition.wait()
+            if self.error is not None:
+                raise self.error
+            if self.next_position == self.total:
+                return None
+            item = self.fragments.pop(self.next_position)
+            self.next_position += 1
+            # The new head of the line may go over the cap
+            self.condition.notify_all()
+            return item
+
+    def fail(self, error):
+        with self.condition:
+            if self.error is None:
+                self.error = error
+            self.condition.notify_all()
+
+
+class BufferedFragmentsMixin:
+    """
+    Fragment assembly for yt-dlp's HLS and DASH downloaders without a
+    .part-FragN file per fragment.
+
+    Worker threads download fragments into a ReorderBuffer capped at
+    `fragment_buffer_size` bytes, and the calling thread writes them in
+    order into the .part file, reserved up front when the size is known.
+    Every byte hits the disk once. The .ytdl file records the bytes
+    written so far, so an interrupted download continues after the last
+    complete fragment.
+
+    The number of workers follows `concurrent_fragment_downloads` as it is
+    before each fragment, so the autotuner's changes apply mid-stream.
+    """
+
+    def download_and_append_fragments(
+            self, ctx, fragments, info_dict, *, is_fatal=(lambda idx: False),
+            pack_func=(lambda content, idx: content), finish_func=None,
+            tpe=None, interrupt_trigger=(True, )):
+        if not self.params.get('skip_unavailable_fragments', True):
+            is_fatal = lambda _: True
+        decrypt_fragment = self.decrypter(info_dict)
+        buffer = ReorderBuffer(self.params.get('fragment_buffer_size') or FRAGMENT_BUFFER_SIZE)
+        self.prepare_output(ctx, info_dict)
+
+        fragments = iter(fragments)
+        handed_out = [0]
+        running = [0]
+        workers = []
+        lock = threading.Lock()
+
+        def worker_limit():
+            # The autotuner changes the option while the stream downloads
+            return max(1, math.ceil(
+                self.params.get('concurrent_fragment_downloads', 1) / ctx.get('max_progress', 1)))
+
+        def start_worker():
+            worker = threading.Thread(target=work, daemon=True)
+            workers.append(worker)
+            running[0] += 1
+            worker.start()
+
+        def next_fragment():
+            """Fragment for a worker to download next, None once the worker should stop"""
+            with lock:
+                limit = worker_limit()
+                if buffer.error is not None or not interrupt_trigger[0] or running[0] > limit:
+                    running[0] -= 1
+                    return None
+                fragment = next(fragments, None)
+                if fragment is None:
+                    buffer.end(handed_out[0])
+                    running[0] -= 1
+                    return None
+                handed_out[0] += 1
+                while running[0] < limit:
+                    start_worker()
+                return handed_out[0] - 1, fragment
+
+        def work():
+            try:
+                item = next_fragment()
+                while item is not None:
+                    position, fragment = item
+                    content, size = self.fetch_fragment(ctx, fragment, info_dict, buffer,
+                                                        position, is_fatal)
+                    buffer.put(position, fragment, content, size)
+                    item = next_fragment()
+            except _Stopped:
+                pass
+            except BaseException as e:
+                # Cancellation raised by a progress hook ends up here as well
+                buffer.fail(e)
+
+        # The first worker starts the others once it has its fragment
+        with lock:
+            start_worker()
+        try:
+            item = buffer.take()
+            while item is not None:
+                fragment, content, size = item
+                frag_index = fragment['frag_index']
+                try:
+                    content = decrypt_fragment(fragment, content)
+                    if content:
+                        self._append_fragment(ctx, pack_func(content, frag_index), frag_index)
+                    elif not is_fatal(frag_index - 1):
+                        self.report_skip_fragment(frag_index, 'fragment not found')
+                    else:
+                        ctx['dest_stream'].close()
+                        self.report_error(f'fragment {frag_index} not found, unable to continue')
+                        return False
+                finally:
+                    buffer.release(size)
+                item = buffer.take()
+        finally:
+            buffer.fail(_Stopped())
+            with lock:
+                # Workers only start while the buffer is fine
+                started = list(workers)
+            # Workers still hold the job's progress hooks, let them go first
+            for worker in started:
+                worker.join()
+
+        if finish_func is not None:
+            ctx['dest_stream'].write(finish_func())
+            ctx['dest_stream'].flush()
+        if ctx['tmpfilename'] != '-':
+            ctx['dest_stream'].truncate()  # Drop what was reserved beyond the end
+        return self._finish_frag_download(ctx, info_dict)
+
+    def prepare_output(self, ctx, info_dict):
+        if ctx['tmpfilename'] == '-':
+            return
+        stream = ctx['dest_stream']
+        state = ctx.setdefault('extra_state', {})
+        if 'written_bytes' in state:
+            # Resuming: cut off the rest of the reservation and the incomplete fragment
+            if os.fstat(stream.fileno()).st_size > state['written_bytes']:
+                stream.truncate(state['written_bytes'])
+        elif stream.tell() == 0:
+            size = info_dict.get('filesize') or info_dict.get('filesize_approx')
+            if size:
+                try:
+                    os.posix_fallocate(stream.fileno(), 0, int(size))
+                except (AttributeError, OSError):
+                    pass  # Not supported here, the file just grows
+            state['written_bytes'] = 0
+            if self.writes_ytdl_file(ctx):
+                self._write_ytdl_file(ctx)
+
+    def writes_ytdl_file(self, ctx):
+        return ctx['live'] is not True and ctx['tmpfilename'] != '-' and \
+            not self.params.get('_no_ytdl_file')
+
+    def fetch_fragment(self, ctx, fragment, info_dict, buffer, position, is_fatal):
+        """Content and reserved size of one fragment, content None when it was skipped"""
+        frag_index = fragment['frag_index']
+        headers = HTTPHeaderDict(info_dict.get('http_headers'))
+        byte_range = fragment.get('byte_range')
+        if byte_range:
+            headers['Range'] = 'bytes=%d-%d' % (byte_range['start'], byte_range['end'] - 1)
+        # Never skip the first fragment
+        fatal = is_fatal(fragment.get('index') or (frag_index - 1))
+
+        def error_callback(err, count, retries):
+            self.report_retry(err, count, retries, frag_index, fatal)
+
+        for retry in RetryManager(self.params.get('fragment_retries'), error_callback):
+            try:
+                return self.read_fragment(ctx, fragment['url'], headers,
+                                          info_dict.get('request_data'), buffer, position)
+            except RequestError as err:
+                retry.error = err
+        return None, 0
+
+    def read_fragment(self, ctx, url, headers, request_data, buffer, position):
+        content = bytearray()
+        progress = {'ctx_id': ctx.get('ctx_id')}
+        response = self.ydl.urlopen(Request(url, data=request_data, headers=headers))
+        try:
+            expected = int_or_none(response.headers.get('Content-Length'))
+            while True:
+                data = response.read(READ_SIZE)
+                if not data:
+                    break
+                buffer.reserve(position, len(data))
+                content += data
+                # Drives the job's progress like yt-dlp's fragment downloader does
+                ctx['dl']._hook_progress({
+                    **progress,
+                    'status': 'downloading',
+                    'downloaded_bytes': len(content),
+                    'total_bytes': expected,
+                }, {})
+            if expected is not None and len(content) < expected:
+                raise IncompleteRead(len(content), expected)
+        except BaseException:
+            buffer.release(len(content))
+            raise
+        finally:
+            response.close()
+        ctx['dl']._hook_progress({
+            **progress,
+            'status': 'finished',
+            'downloaded_bytes': len(content),
+            'total_bytes': len(content),
+        }, {})
+        return content, len(content)
+
+    def _append_fragment(self, ctx, frag_content, frag_index=None):
+        ctx['dest_stream'].write(frag_content)
+        ctx['dest_stream'].flush()
+        if self.writes_ytdl_file(ctx):
+            if frag_index is not None:
+                ctx['fragment_index'] = frag_index
+            ctx.setdefault('extra_state', {})['written_bytes'] = ctx['dest_stream'].tell()
+            self._write_ytdl_file(ctx)
+
+
+class BufferedHlsFD(BufferedFragmentsMixin, HlsFD):
+    pass
+
+
+class BufferedDashSegmentsFD(BufferedFragmentsMixin, DashSegmentsFD):
+    pass
@@ -0,0 +1,106 @@
+import os
+import sqlite3
+import threading
+import time
+
+class JobJournal:
+    """
+    Persistent record of in-flight download jobs, stored in SQLite next to
+    settings.json. Rows are removed once a job ends, so anything left at
+    startup was interrupted and can be resumed.
+
+    Also remembers the fragment parallelism tuned for each CDN host.
+    """
+    QUEUED = "queued"
+    RUNNING = "running"
+
+    def __init__(self, journal_file=None):
+        self.journal_file = journal_file or os.path.join(
+            os.path.dirname(os.path.dirname(__file__)), 'jobs.db')
+        self.lock = threading.Lock()
+        # Written from the download threads, so guard the shared connection
+        self.connection = sqlite3.connect(self.journal_file, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.create_tables()
+
+    def create_tables(self):
+        with self.lock, self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    url TEXT NOT NULL,
+                    format_id TEXT NOT NULL,
+                    resolved_format_id TEXT,
+                    download_path TEXT NOT NULL,
+                    filename TEXT,
+                    status TEXT NOT NULL,
+                    downloaded_bytes INTEGER DEFAULT 0,
+                    total_bytes INTEGER DEFAULT 0,
+                    fragment_index INTEGER,
+                    fragment_count INTEGER,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS host_tuning (
+                    host TEXT PRIMARY KEY,
+                    connections INTEGER NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+
+    def add_job(self, url, format_id, download_path):
+        """Record a newly queued job and return its journal id"""
+        now = time.time()
+        with self.lock, self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO jobs (url, format_id, download_path, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (url, format_id, download_path, JobJournal.QUEUED, now, now)
+            )
+            return cursor.lastrowid
+
+    def start_job(self, journal_id, resolved_format_id, filename):
+        """Store the concrete format and output file picked by yt-dlp"""
+        with self.lock, self.connection:
+            self.connection.execute(
+                "UPDATE jobs SET status = ?, resolved_format_id = ?, filename = ?, updated_at = ? "
+                "WHERE id = ?",
+                (JobJournal.RUNNING, resolved_format_id, filename, time.time(), journal_id)
+            )
+
+    def update_progress(self, journal_id, downloaded_bytes, total_bytes,
+                        fragment_index=None, fragment_count=None):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "UPDATE jobs SET downloaded_bytes = ?, total_bytes = ?, fragment_index = ?, "
+                "fragment_count = ?, updated_at = ? WHERE id = ?",
+                (downloaded_bytes, total_bytes, fragment_index, fragment_count,
+                 time.time(), journal_id)
+            )
+
+    def finish_job(self, journal_id):
+        """Forget a job that completed, failed or was cancelled"""
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM jobs WHERE id = ?", (journal_id,))
+
+    def interrupted_jobs(self):
+        """Jobs left behind by a previous run, oldest first"""
+        with self.lock:
+            rows = self.connection.execute("SELECT * FROM jobs ORDER BY id").fetchall()
+        return [dict(row) for row in rows]
+
+    def get_host_connections(self, host):
+        """Fragment parallelism the last job on `host` ended with, or None"""
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT connections FROM host_tuning WHERE host = ?", (host,)).fetchone()
+        return row['connections'] if row else None
+
+    def set_host_connections(self, host, connections):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO host_tuning (host, connections, updated_at) VALUES (?, ?, ?)",
+                (host, connections, time.time())
+            )
@@ -0,0 +1,100 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from utils.ytdlp_loader import load_extractors
+
+
+def cache_key(url):
+    """
+    Key a URL by extractor and video ID without touching the network, so
+    different links to the same video share one entry. URLs only the
+    generic extractor handles are keyed by the URL itself.
+    """
+    for ie in load_extractors():
+        if ie.suitable(url):
+            video_id = ie.get_temp_id(url)
+            if video_id:
+                return f"{ie.ie_key()}:{video_id}"
+            break
+    return f"url:{url}"
+
+
+class MetadataCache:
+    """
+    On-disk cache of fetch_formats results in SQLite next to settings.json.
+    Entries expire after `ttl` seconds and the least recently used ones are
+    evicted once the stored (compressed) data exceeds `max_size` bytes.
+    """
+    def __init__(self, ttl=6 * 3600, max_size=100 * 1024 * 1024, cache_file=None):
+        self.cache_file = cache_file or os.path.join(
+            os.path.dirname(os.path.dirname(__file__)), 'cache.db')
+        self.ttl = ttl
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.cache_file, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS metadata (
+                    key TEXT PRIMARY KEY,
+                    data BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS metadata_accessed ON metadata (accessed_at)")
+
+    def set_limits(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        with self.lock, self.connection:
+            self._evict()
+
+    def get(self, key):
+        """Cached data for `key`, or None when missing or expired"""
+        now = time.time()
+        with self.lock, self.connection:
+            row = self.connection.execute(
+                "SELECT data, created_at FROM metadata WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self.connection.execute("DELETE FROM metadata WHERE key = ?", (key,))
+                return None
+            self.connection.execute(
+                "UPDATE metadata SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, key, data):
+        blob = zlib.compress(json.dumps(data).encode('utf-8'))
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO metadata (key, data, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, blob, len(blob), now, now)
+            )
+            self._evict()
+
+    def clear(self):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM metadata")
+
+    def _evict(self):
+        self.connection.execute(
+            "DELETE FROM metadata WHERE created_at < ?", (time.time() - self.ttl,))
+        total = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM metadata").fetchone()[0]
+        if total <= self.max_size:
+            return
+        rows = self.connection.execute(
+            "SELECT key, size FROM metadata ORDER BY accessed_at").fetchall()
+        for key, size in rows:
+            if total <= self.max_size:
+                break
+            self.connection.execute("DELETE FROM metadata WHERE key = ?", (key,))
+            total -= size
@@ -0,0 +1,56 @@
+import time
+from collections import deque
+from PyQt5.QtCore import QObject, pyqtSignal
+
+# Notifications kept in memory, older ones are forgotten
+MAX_NOTIFICATIONS = 200
+
+
+class Notification:
+    INFO = "info"
+    SUCCESS = "success"
+    ERROR = "error"
+
+    __slots__ = ('level', 'title', 'message', 'job_id', 'created_at')
+
+    def __init__(self, level, title, message, job_id=None):
+        self.level = level
+        self.title = title
+        self.message = message
+        self.job_id = job_id
+        self.created_at = time.time()
+
+
+class NotificationCenter(QObject):
+    """
+    Ring buffer of recent job completions, failures and other events.
+    Recording one never waits for the user, views follow `added`.
+    """
+    added = pyqtSignal(object)  # Notification
+    unread_changed = pyqtSignal(int)
+
+    def __init__(self, max_notifications=MAX_NOTIFICATIONS, parent=None):
+        super().__init__(parent)
+        self.notifications = deque(maxlen=max_notifications)
+        self.unread = 0
+
+    def notify(self, level, title, message, job_id=None):
+        notification = Notification(level, title, message, job_id)
+        self.notifications.append(notification)
+        self.unread = min(self.unread + 1, len(self.notifications))
+        self.added.emit(notification)
+        self.unread_changed.emit(self.unread)
+        return notification
+
+    def recent(self):
+        """Notifications still kept, newest first"""
+        return list(reversed(self.notifications))
+
+    def mark_read(self):
+        if self.unread:
+            self.unread = 0
+            self.unread_changed.emit(0)
+
+    def clear(self):
+        self.notifications.clear()
+        self.mark_read()
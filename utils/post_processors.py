@@ -0,0 +1,47 @@
+import os
+from yt_dlp import YoutubeDL
+from yt_dlp.postprocessor import (
+    EmbedThumbnailPP, FFmpegExtractAudioPP, FFmpegMetadataPP, FFmpegPostProcessor
+)
+from yt_dlp.postprocessor.common import PostProcessor
+from yt_dlp.utils import prepend_extension
+
+
+class OptimizeVideoPP(FFmpegPostProcessor):
+    """Re-encodes a video to H.264/AAC MP4 with the index at the front, playable nearly everywhere"""
+
+    @PostProcessor._restrict_to(images=False, audio=False)
+    def run(self, info):
+        path = info['filepath']
+        target = os.path.splitext(path)[0] + '.mp4'
+        temp_path = prepend_extension(target, 'temp')
+        self.to_screen(f'Optimizing "{path}"')
+        self.run_ffmpeg(path, temp_path, [
+            '-c:v', 'libx264', '-preset', 'medium', '-crf', '23',
+            '-c:a', 'aac', '-b:a', '192k', '-movflags', '+faststart'])
+        os.replace(temp_path, target)
+        info['filepath'] = target
+        info['ext'] = 'mp4'
+        return ([path] if path != target else []), info
+
+
+def post_process_downloads(downloads, options):
+    """
+    Run the postprocessors `options` asks for (see post_process_options)
+    over the info dicts of downloaded files. False when ffmpeg is missing
+    and nothing was done.
+    """
+    ydl = YoutubeDL({'quiet': True, 'noprogress': True}, auto_init=False)
+    if not FFmpegPostProcessor(ydl).available:
+        return False
+    if options['audio_format']:
+        ydl.add_post_processor(FFmpegExtractAudioPP(ydl, options['audio_format']))
+    elif options['optimize_video']:
+        ydl.add_post_processor(OptimizeVideoPP(ydl))
+    if options['add_metadata']:
+        ydl.add_post_processor(FFmpegMetadataPP(ydl, add_infojson=False))
+        # Last, rewriting the file for the metadata would drop the cover
+        ydl.add_post_processor(EmbedThumbnailPP(ydl))
+    for info in downloads:
+        ydl.post_process(info['filepath'], info)
+    return True
@@ -0,0 +1,95 @@
+import threading
+import time
+
+class TokenBucket:
+    """
+    Token bucket measured in bytes. A rate of 0 means unlimited.
+    Tokens may go negative: the caller that overdraws the bucket is told how
+    long to wait, which keeps the average rate at `rate` bytes per second.
+    """
+    def __init__(self, rate=0):
+        self.lock = threading.Lock()
+        self.rate = 0
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        with self.lock:
+            self.rate = max(0, int(rate or 0))
+            # Allow at most one second worth of burst
+            self.tokens = min(self.tokens, float(self.rate))
+            self.updated = time.monotonic()
+
+    def reserve(self, amount):
+        """Take `amount` bytes from the bucket and return the seconds to wait"""
+        with self.lock:
+            if not self.rate:
+                return 0.0
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+
+class BandwidthLimiter:
+    """
+    Caps the combined speed of all downloads and the speed of each single
+    download. Rates are in bytes per second, 0 meaning unlimited, and can be
+    changed at any time; running downloads follow the new rates immediately.
+    """
+    # Longest single sleep, so cancellation is noticed quickly
+    MAX_SLEEP = 0.25
+
+    def __init__(self, global_rate=0, per_job_rate=0):
+        self.lock = threading.Lock()
+        self.global_bucket = TokenBucket(global_rate)
+        self.per_job_rate = per_job_rate
+        self.job_buckets = {}
+
+    def set_rates(self, global_rate, per_job_rate):
+        self.global_bucket.set_rate(global_rate)
+        with self.lock:
+            self.per_job_rate = per_job_rate
+            for bucket in self.job_buckets.values():
+                bucket.set_rate(per_job_rate)
+
+    def job_share(self):
+        """
+        Even split of the global cap over the registered jobs, plus the
+        per-job cap, for downloads that cannot call consume() directly
+        """
+        with self.lock:
+            jobs = max(1, len(self.job_buckets))
+            per_job_rate = self.per_job_rate
+        return self.global_bucket.rate // jobs, per_job_rate
+
+    def register(self, job_key):
+        with self.lock:
+            if job_key not in self.job_buckets:
+                self.job_buckets[job_key] = TokenBucket(self.per_job_rate)
+
+    def unregister(self, job_key):
+        with self.lock:
+            self.job_buckets.pop(job_key, None)
+
+    def consume(self, job_key, amount, is_cancelled=None):
+        """Account for `amount` downloaded bytes, blocking the caller as needed"""
+        if amount <= 0:
+            return
+        with self.lock:
+            job_bucket = self.job_buckets.get(job_key)
+
+        delay = self.global_bucket.reserve(amount)
+        if job_bucket:
+            delay = max(delay, job_bucket.reserve(amount))
+
+        deadline = time.monotonic() + delay
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or (is_cancelled and is_cancelled()):
+                return
+            time.sleep(min(remaining, self.MAX_SLEEP))
@@ -0,0 +1,323 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from yt_dlp.downloader.http import HttpFD
+from yt_dlp.networking import Request
+from yt_dlp.networking.exceptions import HTTPError, TransportError
+from yt_dlp.utils.networking import HTTPHeaderDict
+
+# Ranges are never split below this, smaller files use a single connection
+MIN_SEGMENT_SIZE = 1024 * 1024
+# Bytes read from a connection at a time
+READ_SIZE = 64 * 1024
+# Seconds between two saves of the ranges still missing
+STATE_INTERVAL = 1.0
+
+
+class SegmentError(Exception):
+    pass
+
+
+class Segment:
+    """Byte range [position, end) one connection is working through"""
+    __slots__ = ('position', 'end', 'started_at', 'received')
+
+    def __init__(self, position, end):
+        self.position = position
+        self.end = end
+        self.started_at = time.monotonic()
+        self.received = 0
+
+    def remaining(self):
+        return self.end - self.position
+
+    def finish_time(self, now):
+        """Seconds this segment still needs at its speed so far"""
+        elapsed = now - self.started_at
+        speed = self.received / elapsed if elapsed > 0 else 0
+        return self.remaining() / speed if speed else float('inf')
+
+
+class SegmentPlan:
+    """
+    The segments of one file. Connections take the waiting segments first;
+    once none are left, a connection that runs out of work takes over the
+    back half of the segment expected to finish last.
+
+    A segment's position only moves forward, by its own connection; its
+    end only moves back, by a split. Both change under the lock.
+    """
+    def __init__(self, ranges):
+        self.lock = threading.Lock()
+        self.waiting = deque(Segment(start, end) for start, end in ranges)
+        self.active = []
+        self.error = None
+
+    @classmethod
+    def split(cls, total, count):
+        size = max(MIN_SEGMENT_SIZE, -(-total // count))
+        return cls([(start, min(start + size, total)) for start in range(0, total, size)])
+
+    def next_segment(self):
+        """Segment for a connection that is free, None when nothing is left to share"""
+        now = time.monotonic()
+        with self.lock:
+            if self.error is not None:
+                return None
+            if self.waiting:
+                segment = self.waiting.popleft()
+                segment.started_at = now
+            else:
+                candidates = [s for s in self.active if s.remaining() >= 2 * MIN_SEGMENT_SIZE]
+                if not candidates:
+                    return None
+                victim = max(candidates, key=lambda s: s.finish_time(now))
+                middle = victim.position + victim.remaining() // 2
+                segment = Segment(middle, victim.end)
+                victim.end = middle
+            self.active.append(segment)
+            return segment
+
+    def writable(self, segment, length):
+        """How much of `length` bytes at the segment's position are still its own"""
+        with self.lock:
+            return max(0, min(length, segment.remaining()))
+
+    def advance(self, segment, length):
+        with self.lock:
+            segment.position += length
+            segment.received += length
+
+    def missing(self):
+        with self.lock:
+            return [[s.position, s.end] for s in list(self.waiting) + self.active
+                    if s.remaining() > 0]
+
+    def fail(self, error):
+        with self.lock:
+            if self.error is None:
+                self.error = error
+
+
+class SegmentedTransfer:
+    """One file being downloaded by SegmentedHttpFD"""
+    def __init__(self, url, headers, filename, tmpfilename, total, plan, info_dict):
+        self.url = url
+        self.headers = headers
+        self.filename = filename
+        self.tmpfilename = tmpfilename
+        self.total = total
+        self.plan = plan
+        self.info_dict = info_dict
+        self.progress_lock = threading.Lock()
+        self.resumed = total - sum(end - start for start, end in plan.missing())
+        self.downloaded = self.resumed
+        self.start = time.time()
+
+
+class SegmentedHttpFD(HttpFD):
+    """
+    Downloads a plain HTTP(S) file over several connections at once, one
+    byte range each, written in place into a preallocated .part file.
+
+    The number of connections is `concurrent_fragment_downloads`, so the
+    max_connections setting and the autotuner apply as they do to HLS and
+    DASH fragments. When a connection is done with its range it takes
+    over the back half of the range expected to finish last, so one slow
+    connection never holds up the end of the download.
+
+    The ranges still missing are saved next to the .part file, and an
+    interrupted download continues where each connection stopped. Files
+    the segments can't handle (unknown size, no range support, a .part
+    file left by a single connection download) go to HttpFD.
+    """
+    FD_NAME = 'segmented http'
+
+    def real_download(self, filename, info_dict):
+        connections = max(int(self.params.get('concurrent_fragment_downloads') or 1), 1)
+        headers = HTTPHeaderDict({'Accept-Encoding': 'identity'}, info_dict.get('http_headers'))
+        segmentable = not info_dict.get('request_data') and 'Range' not in headers
+
+        url = info_dict['url']
+        tmpfilename = self.temp_name(filename)
+        state_file = tmpfilename + '.segments'
+        # Looked at before the number of connections: a .part file with
+        # segment state has holes, HttpFD would take it for a finished file.
+        # The plan is continued even with a single connection.
+        state = self.load_state(state_file, tmpfilename) if segmentable else None
+        if state is None:
+            if os.path.isfile(state_file):
+                # Without usable state the preallocated .part file is of no use either
+                self.remove_state(state_file, tmpfilename)
+            elif os.path.isfile(tmpfilename) and self.params.get('continuedl', True):
+                return super().real_download(filename, info_dict)
+            if connections < 2 or not segmentable:
+                return super().real_download(filename, info_dict)
+
+        total, last_modified = self.probe(url, headers)
+        if state and state['total'] != total:
+            self.to_screen("[download] File changed on the server, starting over")
+            self.remove_state(state_file, tmpfilename)
+            state = None
+        if state is None and (connections < 2 or total is None or total < 2 * MIN_SEGMENT_SIZE):
+            return super().real_download(filename, info_dict)
+
+        if state:
+            plan = SegmentPlan(state['ranges'])
+        else:
+            plan = SegmentPlan.split(total, connections)
+            self.preallocate(tmpfilename, total)
+        transfer = SegmentedTransfer(url, headers, filename, tmpfilename, total, plan, info_dict)
+        if transfer.resumed:
+            self.report_resuming_byte(transfer.resumed)
+        self.report_destination(filename)
+
+        workers = [threading.Thread(target=self.work, args=(transfer,), daemon=True)
+                   for _ in range(connections)]
+        for worker in workers:
+            worker.start()
+        while workers:
+            workers[0].join(STATE_INTERVAL)
+            self.save_state(state_file, total, plan)
+            workers = [worker for worker in workers if worker.is_alive()]
+
+        if plan.error is not None:
+            raise plan.error
+        if plan.missing():
+            raise SegmentError("Segmented download ended with ranges missing")
+
+        self.remove_state(state_file)
+        self.try_rename(tmpfilename, filename)
+        if self.params.get('updatetime'):
+            self.try_utime(filename, last_modified)
+        self._hook_progress({
+            'downloaded_bytes': total,
+            'total_bytes': total,
+            'filename': filename,
+            'status': 'finished',
+            'elapsed': time.time() - transfer.start,
+        }, info_dict)
+        return True
+
+    def probe(self, url, headers):
+        """Total size and Last-Modified, size None when the server ignores ranges"""
+        response = self.ydl.urlopen(Request(url, headers={**headers, 'Range': 'bytes=0-0'}))
+        try:
+            content_range = response.headers.get('Content-Range') or ''
+            if response.status != 206 or not content_range.startswith('bytes 0-0/'):
+                return None, None
+            total = content_range.rpartition('/')[2]
+            return (int(total) if total.isdigit() else None), response.headers.get('Last-Modified')
+        finally:
+            response.close()
+
+    def preallocate(self, tmpfilename, total):
+        # Reserving the space up front keeps parallel writes from fragmenting the file
+        with open(tmpfilename, 'wb') as f:
+            try:
+                os.posix_fallocate(f.fileno(), 0, total)
+            except (AttributeError, OSError):
+                f.truncate(total)
+
+    def work(self, transfer):
+        """One connection: download segments until none are left to share"""
+        plan = transfer.plan
+        try:
+            with open(transfer.tmpfilename, 'r+b', buffering=0) as f:
+                segment = plan.next_segment()
+                while segment is not None:
+                    self.download_segment(transfer, segment, f)
+                    segment = plan.next_segment()
+        except Exception as e:
+            # Cancellation raised by a progress hook ends up here as well
+            plan.fail(e)
+
+    def download_segment(self, transfer, segment, f):
+        plan = transfer.plan
+        retries = self.params.get('retries', 10)
+        chunk_size = self.params.get('http_chunk_size') or \
+            transfer.info_dict.get('downloader_options', {}).get('http_chunk_size') or 0
+        count = 0
+        while segment.remaining() > 0 and plan.error is None:
+            # Servers that throttle long responses are asked for chunk_size pieces
+            end = segment.end if not chunk_size else min(segment.end, segment.position + chunk_size)
+            headers = {**transfer.headers, 'Range': f'bytes={segment.position}-{end - 1}'}
+            try:
+                response = self.ydl.urlopen(Request(transfer.url, headers=headers))
+                try:
+                    content_range = response.headers.get('Content-Range') or ''
+                    if response.status != 206 or not content_range.startswith(f'bytes {segment.position}-'):
+                        raise SegmentError(f"Server ignored the range at byte {segment.position}")
+                    while plan.error is None and segment.position < min(end, segment.end):
+                        data = response.read(min(READ_SIZE, end - segment.position))
+                        if not data:
+                            break
+                        # Part of the range may have been taken over meanwhile
+                        length = plan.writable(segment, len(data))
+                        if length:
+                            f.seek(segment.position)
+                            f.write(data[:length])
+                            plan.advance(segment, length)
+                            self.report_bytes(transfer, length)
+                        count = 0
+                finally:
+                    response.close()
+                if plan.error is None and segment.position < min(end, segment.end):
+                    raise TransportError(f"Connection closed at byte {segment.position}")
+            except (HTTPError, TransportError, OSError) as e:
+                if isinstance(e, HTTPError) and not 500 <= e.status < 600:
+                    raise
+                count += 1
+                if count > retries:
+                    raise
+                # Counted by DownloadLogger like yt-dlp's own retries
+                self.to_screen(f"[download] Got error: {e}. Retrying range "
+                               f"at byte {segment.position} ({count}/{retries})...")
+                time.sleep(min(count, 5))
+
+    def report_bytes(self, transfer, length):
+        # Serialized, so hooks see a growing byte count and a blocking
+        # bandwidth limiter holds back every connection of the file
+        with transfer.progress_lock:
+            transfer.downloaded += length
+            downloaded = transfer.downloaded
+            elapsed = time.time() - transfer.start
+            speed = (downloaded - transfer.resumed) / elapsed if elapsed > 0 else None
+            self._hook_progress({
+                'status': 'downloading',
+                'downloaded_bytes': downloaded,
+                'total_bytes': transfer.total,
+                'tmpfilename': transfer.tmpfilename,
+                'filename': transfer.filename,
+                'elapsed': elapsed,
+                'speed': speed,
+                'eta': (transfer.total - downloaded) / speed if speed else None,
+            }, transfer.info_dict)
+
+    def load_state(self, state_file, tmpfilename):
+        if not self.params.get('continuedl', True) or not os.path.isfile(tmpfilename):
+            return None
+        try:
+            with open(state_file, encoding='utf-8') as f:
+                state = json.load(f)
+            if os.path.getsize(tmpfilename) != state['total']:
+                return None
+            return state
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save_state(self, state_file, total, plan):
+        temp_file = state_file + '.tmp'
+        try:
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump({'total': total, 'ranges': plan.missing()}, f)
+            os.replace(temp_file, state_file)
+        except OSError as e:
+            self.report_warning(f"Unable to save the download state: {e}")
+
+    def remove_state(self, state_file, tmpfilename=None):
+        for path in (state_file, tmpfilename):
+            if path and os.path.isfile(path):
+                os.remove(path)
@@ -1,24 +1,61 @@
+import atexit
+import copy
 import json
 import os
+import tempfile
+import threading
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
 
-class Settings:
-    def __init__(self):
-        self.settings_file = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'settings.json')
+# Milliseconds to wait for more changes before writing settings.json
+SAVE_DELAY = 500
+
+_settings = None
+_settings_lock = threading.Lock()
+
+
+class Settings(QObject):
+    """
+    Application settings, read from settings.json once and kept in memory.
+    Use get_settings() for the instance shared by the whole process.
+
+    Changes are announced through `changed` and written back after
+    SAVE_DELAY, to a temporary file that then replaces settings.json, so a
+    crash mid-write never leaves a truncated file behind.
+    """
+    changed = pyqtSignal(str, str, object)  # section, key, new value
+
+    def __init__(self, settings_file=None):
+        super().__init__()
+        self.settings_file = settings_file or os.path.join(
+            os.path.dirname(os.path.dirname(__file__)), 'settings.json')
         self.default_settings = {
             "general": {
                 "default_download_location": os.path.join(os.path.expanduser("~"), "Downloads"),
-                "theme": "light"
+                "theme": "light",
+                "api_enabled": False,
+                "api_port": 9614,
+                "api_token": ""
             },
             "downloader": {
                 "max_connections": 10,
+                "max_concurrent_downloads": 3,
+                "global_rate_limit": 0,
+                "per_job_rate_limit": 0,
+                "use_process_pool": False,
+                "fragment_buffer_size": 64,
+                "metadata_cache_ttl": 360,
+                "metadata_cache_size": 100,
                 "post_process_audio": False,
                 "post_process_video": False,
+                "stream_merge": False,
                 "preferred_audio_format": "mp3",
                 "preferred_video_quality": "best",
                 "auto_add_metadata": True
             }
         }
         self.settings = {}
+        self.dirty = False
+        self.save_timer = None  # Created on first save, needs the Qt event loop
         self.load()
 
     def load(self):
@@ -27,30 +64,59 @@ class Settings:
                 with open(self.settings_file, 'r') as f:
                     self.settings = json.load(f)
             else:
-                self.settings = self.default_settings.copy()
-                self.save_settings()
+                self.settings = copy.deepcopy(self.default_settings)
+                self.dirty = True
+                self.flush()
         except Exception as e:
             print(f"Error loading settings: {e}")
-            self.settings = self.default_settings.copy()
+            self.settings = copy.deepcopy(self.default_settings)
 
     def __save_settings__(self):
+        directory = os.path.dirname(self.settings_file)
         try:
-            with open(self.settings_file, 'w') as f:
-                json.dump(self.settings, f, indent=4)
+            fd, temp_file = tempfile.mkstemp(prefix='.settings-', suffix='.tmp', dir=directory)
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(self.settings, f, indent=4)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_file, self.settings_file)
+            except BaseException:
+                os.remove(temp_file)
+                raise
         except Exception as e:
             print(f"Error saving settings: {e}")
 
     # Getters and Setters for each setting
     def __get_setting__(self, section, key):
-        return self.settings.get(section, {}).get(key, None)
+        default = self.default_settings.get(section, {}).get(key, None)
+        return self.settings.get(section, {}).get(key, default)
     
     def __set_setting__(self, section, key, value):
+        if self.__get_setting__(section, key) == value:
+            return
         if section not in self.settings:
             self.settings[section] = {}
         self.settings[section][key] = value
+        self.dirty = True
+        self.changed.emit(section, key, value)
 
     def save(self):
-        self.__save_settings__()
+        """Write the changes after SAVE_DELAY, batching the ones that follow"""
+        if self.save_timer is None:
+            self.save_timer = QTimer(self)
+            self.save_timer.setSingleShot(True)
+            self.save_timer.setInterval(SAVE_DELAY)
+            self.save_timer.timeout.connect(self.flush)
+        self.save_timer.start()
+
+    def flush(self):
+        """Write pending changes now"""
+        if self.save_timer is not None:
+            self.save_timer.stop()
+        if self.dirty:
+            self.dirty = False
+            self.__save_settings__()
 
     def get_default_download_location(self):
         return self.__get_setting__('general', 'default_download_location')
@@ -60,10 +126,50 @@ class Settings:
         return self.__get_setting__('general', 'theme')
     def set_theme(self, value):
         self.__set_setting__('general', 'theme', value)
+    def get_api_enabled(self):
+        return self.__get_setting__('general', 'api_enabled')
+    def set_api_enabled(self, value):
+        self.__set_setting__('general', 'api_enabled', value)
+    def get_api_port(self):
+        return self.__get_setting__('general', 'api_port')
+    def set_api_port(self, value):
+        self.__set_setting__('general', 'api_port', value)
+    def get_api_token(self):
+        return self.__get_setting__('general', 'api_token')
+    def set_api_token(self, value):
+        self.__set_setting__('general', 'api_token', value)
     def get_max_connections(self):
         return self.__get_setting__('downloader', 'max_connections')
     def set_max_connections(self, value):
         self.__set_setting__('downloader', 'max_connections', value)
+    def get_max_concurrent_downloads(self):
+        return self.__get_setting__('downloader', 'max_concurrent_downloads')
+    def set_max_concurrent_downloads(self, value):
+        self.__set_setting__('downloader', 'max_concurrent_downloads', value)
+    def get_global_rate_limit(self):
+        return self.__get_setting__('downloader', 'global_rate_limit')
+    def set_global_rate_limit(self, value):
+        self.__set_setting__('downloader', 'global_rate_limit', value)
+    def get_per_job_rate_limit(self):
+        return self.__get_setting__('downloader', 'per_job_rate_limit')
+    def set_per_job_rate_limit(self, value):
+        self.__set_setting__('downloader', 'per_job_rate_limit', value)
+    def get_use_process_pool(self):
+        return self.__get_setting__('downloader', 'use_process_pool')
+    def set_use_process_pool(self, value):
+        self.__set_setting__('downloader', 'use_process_pool', value)
+    def get_fragment_buffer_size(self):
+        return self.__get_setting__('downloader', 'fragment_buffer_size')
+    def set_fragment_buffer_size(self, value):
+        self.__set_setting__('downloader', 'fragment_buffer_size', value)
+    def get_metadata_cache_ttl(self):
+        return self.__get_setting__('downloader', 'metadata_cache_ttl')
+    def set_metadata_cache_ttl(self, value):
+        self.__set_setting__('downloader', 'metadata_cache_ttl', value)
+    def get_metadata_cache_size(self):
+        return self.__get_setting__('downloader', 'metadata_cache_size')
+    def set_metadata_cache_size(self, value):
+        self.__set_setting__('downloader', 'metadata_cache_size', value)
     def get_post_process_audio(self):
         return self.__get_setting__('downloader', 'post_process_audio')
     def set_post_process_audio(self, value):
@@ -72,6 +178,10 @@ class Settings:
         return self.__get_setting__('downloader', 'post_process_video')
     def set_post_process_video(self, value):
         self.__set_setting__('downloader', 'post_process_video', value)
+    def get_stream_merge(self):
+        return self.__get_setting__('downloader', 'stream_merge')
+    def set_stream_merge(self, value):
+        self.__set_setting__('downloader', 'stream_merge', value)
     def get_preferred_audio_format(self):
         return self.__get_setting__('downloader', 'preferred_audio_format')
     def set_preferred_audio_format(self, value):
@@ -83,4 +193,14 @@ class Settings:
     def get_auto_add_metadata(self):
         return self.__get_setting__('downloader', 'auto_add_metadata')
     def set_auto_add_metadata(self, value):
-        self.__set_setting__('downloader', 'auto_add_metadata', value)
\ No newline at end of file
+        self.__set_setting__('downloader', 'auto_add_metadata', value)
+
+
+def get_settings():
+    global _settings
+    with _settings_lock:
+        if _settings is None:
+            _settings = Settings()
+            # Changes still waiting for SAVE_DELAY when the app exits
+            atexit.register(_settings.flush)
+        return _settings
@@ -0,0 +1,76 @@
+import getpass
+from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtNetwork import QLocalServer, QLocalSocket
+
+# Milliseconds a new launch waits for the running instance
+CONNECT_TIMEOUT = 500
+
+
+def server_name():
+    # One instance per user, other accounts on the machine get their own
+    return f"streamsaver-{getpass.getuser()}"
+
+
+def forward_to_running_instance(url):
+    """
+    Hand `url` (None to just bring the window up) to an already running
+    instance. Returns False when there is none and this launch should start
+    the application itself.
+    """
+    socket = QLocalSocket()
+    socket.connectToServer(server_name())
+    if not socket.waitForConnected(CONNECT_TIMEOUT):
+        return False
+    # One URL per line, an empty line only raises the window
+    socket.write(((url or '') + '\n').encode('utf-8'))
+    socket.waitForBytesWritten(CONNECT_TIMEOUT)
+    socket.disconnectFromServer()
+    if socket.state() != QLocalSocket.UnconnectedState:
+        socket.waitForDisconnected(CONNECT_TIMEOUT)
+    return True
+
+
+class SingleInstanceServer(QObject):
+    """
+    Local endpoint (named pipe on Windows, Unix socket elsewhere) through
+    which later launches pass their URL to this process and exit.
+    """
+    url_received = pyqtSignal(str)  # Empty when the launch had no URL
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.server = QLocalServer(self)
+        self.server.newConnection.connect(self.accept_connections)
+        self.buffers = {}  # socket -> bytes received so far
+
+    def listen(self):
+        name = server_name()
+        if self.server.listen(name):
+            return True
+        socket = QLocalSocket()
+        socket.connectToServer(name)
+        if socket.waitForConnected(CONNECT_TIMEOUT):
+            # Another instance started at the same time and won
+            socket.abort()
+            return False
+        # Nobody answers, the socket was left behind by a crashed instance
+        QLocalServer.removeServer(name)
+        return self.server.listen(name)
+
+    def accept_connections(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            self.buffers[socket] = b''
+            socket.readyRead.connect(lambda socket=socket: self.read_socket(socket))
+            socket.disconnected.connect(lambda socket=socket: self.close_socket(socket))
+
+    def read_socket(self, socket):
+        data = self.buffers.get(socket, b'') + bytes(socket.readAll())
+        *lines, self.buffers[socket] = data.split(b'\n')
+        for line in lines:
+            self.url_received.emit(line.decode('utf-8', 'replace').strip())
+
+    def close_socket(self, socket):
+        self.read_socket(socket)
+        self.buffers.pop(socket, None)
+        socket.deleteLater()
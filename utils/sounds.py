@@ -1,11 +1,46 @@
 import platform
+import queue
+import shutil
 import sys
 import os
+import threading
+import time
+
+# Minimum seconds between two sounds, requests in between are dropped
+MIN_INTERVAL = 1.0
 
 class Sounds():
+    """
+    Dialog sounds, played on a background thread shared by all instances so
+    the GUI never waits for a player process. Which Linux player works and
+    which sound files exist is found out once per session.
+    """
+    _requests = None  # Sound waiting for the player thread, at most one
+    _lock = threading.Lock()
+    _last_request = 0.0
+    _linux_player = None  # Name of the method that worked, False if none did
+    _sound_files = {}  # icon type -> sound file for paplay, None if there is none
 
     def play_system_sound(self, icon_type):
-        """Play appropriate system sound for dialog type (cross-platform)"""
+        """Play appropriate system sound for dialog type (cross-platform), returns immediately"""
+        with Sounds._lock:
+            now = time.monotonic()
+            if now - Sounds._last_request < MIN_INTERVAL:
+                return
+            Sounds._last_request = now
+            if Sounds._requests is None:
+                Sounds._requests = queue.Queue(maxsize=1)
+                threading.Thread(target=self._run_player, daemon=True).start()
+        try:
+            Sounds._requests.put_nowait(icon_type)
+        except queue.Full:
+            pass  # Still playing a sound, one is enough
+
+    def _run_player(self):
+        while True:
+            self._play_now(Sounds._requests.get())
+
+    def _play_now(self, icon_type):
         try:
             system = platform.system().lower()
             
@@ -67,54 +102,67 @@ class Sounds():
     def _play_linux_sound(self, icon_type):
         """Play Linux system sounds"""
         try:
-            import subprocess
-            
-            # Try different sound systems in order of preference
+            if Sounds._linux_player:
+                getattr(self, Sounds._linux_player)(icon_type)
+                return
+            if Sounds._linux_player is False:
+                self._play_fallback_sound()
+                return
+
+            # Try different sound systems in order of preference, and
+            # stick with the first one that works
             sound_commands = [
                 # PulseAudio/ALSA with paplay
-                self._try_paplay_sound,
+                "_try_paplay_sound",
                 # ALSA with aplay
-                self._try_aplay_sound,
+                "_try_aplay_sound",
                 # System beep
-                self._try_system_beep
+                "_try_system_beep"
             ]
             
             for sound_cmd in sound_commands:
-                if sound_cmd(icon_type):
+                if getattr(self, sound_cmd)(icon_type):
+                    Sounds._linux_player = sound_cmd
                     return
+            Sounds._linux_player = False
+            self._play_fallback_sound()
                     
         except Exception:
             self._play_fallback_sound()
+
+    def _sound_file(self, icon_type):
+        """First existing sound file for `icon_type`, looked up once"""
+        if icon_type in Sounds._sound_files:
+            return Sounds._sound_files[icon_type]
+
+        sound_map = {
+            "info": "message",
+            "warning": "dialog-warning", 
+            "error": "dialog-error",
+            "question": "dialog-question"
+        }
+        sound_name = sound_map.get(icon_type, "message")
+
+        # Common sound file locations
+        sound_paths = [
+            f"/usr/share/sounds/freedesktop/stereo/{sound_name}.oga",
+            f"/usr/share/sounds/ubuntu/stereo/{sound_name}.ogg",
+            f"/usr/share/sounds/gnome/default/alerts/{sound_name}.ogg"
+        ]
+        sound_file = next((path for path in sound_paths if os.path.exists(path)), None)
+        Sounds._sound_files[icon_type] = sound_file
+        return sound_file
     
     def _try_paplay_sound(self, icon_type):
         """Try to play sound using paplay (PulseAudio)"""
         try:
             import subprocess
-            sound_map = {
-                "info": "message",
-                "warning": "dialog-warning", 
-                "error": "dialog-error",
-                "question": "dialog-question"
-            }
-            
-            sound_name = sound_map.get(icon_type, "message")
-            
-            # Common sound file locations
-            sound_paths = [
-                f"/usr/share/sounds/freedesktop/stereo/{sound_name}.oga",
-                f"/usr/share/sounds/ubuntu/stereo/{sound_name}.ogg",
-                f"/usr/share/sounds/gnome/default/alerts/{sound_name}.ogg"
-            ]
-            
-            for sound_path in sound_paths:
-                try:
-                    result = subprocess.run(["paplay", sound_path], 
-                                          check=False, capture_output=True, timeout=2)
-                    if result.returncode == 0:
-                        return True
-                except (FileNotFoundError, subprocess.TimeoutExpired):
-                    continue
-            return False
+            sound_path = self._sound_file(icon_type)
+            if not sound_path or not shutil.which("paplay"):
+                return False
+            result = subprocess.run(["paplay", sound_path], 
+                                  check=False, capture_output=True, timeout=2)
+            return result.returncode == 0
         except:
             return False
     
@@ -130,6 +178,8 @@ class Sounds():
                 "question": "600"
             }
             freq = freq_map.get(icon_type, "800")
+            if not shutil.which("speaker-test"):
+                return False
             
             result = subprocess.run([
                 "speaker-test", "-t", "sine", "-f", freq, "-l", "1", "-s", "1"
@@ -151,6 +201,8 @@ class Sounds():
                 "question": 1
             }
             count = beep_count.get(icon_type, 1)
+            if not shutil.which("beep"):
+                return False
             
             for _ in range(count):
                 subprocess.run(["beep"], check=False, capture_output=True, timeout=1)
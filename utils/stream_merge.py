@@ -0,0 +1,277 @@
+import collections
+import functools
+import os
+import subprocess
+import threading
+import time
+from yt_dlp.downloader.common import FileDownloader
+from yt_dlp.networking import Request
+from yt_dlp.networking.exceptions import HTTPError, TransportError
+from yt_dlp.postprocessor.ffmpeg import EXT_TO_OUT_FORMATS, FFmpegPostProcessor
+from yt_dlp.utils import int_or_none
+from yt_dlp.utils.networking import HTTPHeaderDict
+
+# Protocol of merged formats handed to StreamingMergeFD instead of being
+# downloaded one by one and merged afterwards
+STREAM_MERGE_PROTOCOL = 'stream_merge'
+# Bytes read from a connection at a time
+READ_SIZE = 64 * 1024
+# Containers ffmpeg can read front to back from a pipe
+STREAMABLE_CONTAINERS = ('mp4_dash', 'm4a_dash', 'webm_dash')
+STREAMABLE_EXTS = ('webm', 'mkv')
+# Lines of ffmpeg output kept for the error message
+STDERR_LINES = 20
+
+
+class StreamMergeError(Exception):
+    """ffmpeg could not merge the streams, downloading them separately may still work"""
+
+
+class StreamingTransfer:
+    """The streams of one merge, on their way into ffmpeg"""
+    def __init__(self, filename, tmpfilename, formats, info_dict):
+        self.filename = filename
+        self.tmpfilename = tmpfilename
+        self.formats = formats
+        self.info_dict = info_dict
+        self.progress_lock = threading.Lock()
+        self.hook_lock = threading.Lock()  # Held by the stream reporting progress
+        self.downloaded = [0] * len(formats)
+        self.totals = [f.get('filesize') or f.get('filesize_approx') for f in formats]
+        self.start = time.time()
+        self.error = None
+        self.broken_pipe = False
+
+    def fail(self, error):
+        with self.progress_lock:
+            if self.error is None:
+                self.error = error
+
+
+class StreamingMergeFD(FileDownloader):
+    """
+    Downloads a video-only and an audio-only format at the same time and
+    remuxes them while they arrive: each stream is written into a pipe, a
+    single ffmpeg process reads both and writes the merged file. The
+    streams never touch the disk on their own and there is no merge pass
+    after the download.
+
+    Only plain HTTP(S) formats in containers ffmpeg can read front to back
+    qualify, see can_merge. A merge can't continue where it stopped, an
+    interrupted download starts over. StreamMergeError means ffmpeg gave
+    up on the streams; PooledYoutubeDL then downloads them separately.
+    """
+    FD_NAME = 'stream merge'
+
+    @staticmethod
+    def can_merge(ydl, info_dict):
+        params = ydl.params
+        formats = info_dict.get('requested_formats') or ()
+        if not params.get('stream_merge') or len(formats) != 2 or os.name != 'posix':
+            return False
+        if params.get('allow_unplayable_formats') or params.get('external_downloader') or \
+                info_dict.get('section_start') or info_dict.get('section_end'):
+            return False
+        kinds = sorted((f.get('vcodec') != 'none', f.get('acodec') != 'none') for f in formats)
+        if kinds != [(False, True), (True, False)]:
+            return False  # Not one video-only and one audio-only format
+        for f in formats:
+            if f.get('protocol') not in ('http', 'https') or f.get('request_data') or \
+                    'Range' in (f.get('http_headers') or {}):
+                return False
+            if f.get('container') not in STREAMABLE_CONTAINERS and f.get('ext') not in STREAMABLE_EXTS:
+                return False
+        return FFmpegPostProcessor(ydl).available
+
+    def real_download(self, filename, info_dict):
+        ffmpeg = FFmpegPostProcessor(self.ydl)
+        tmpfilename = self.temp_name(filename)
+        formats = self.input_formats(info_dict)
+        transfer = StreamingTransfer(filename, tmpfilename, formats, info_dict)
+        attachments = self.attachments(info_dict)
+        self.report_destination(filename)
+
+        # Not inherited, except for the read ends passed on to ffmpeg
+        pipes = [os.pipe() for _ in range(len(formats) + len(attachments))]
+        # -xerror: an input ffmpeg can't read from a pipe (e.g. an MP4 with its
+        # index at the end) fails the merge instead of being left out
+        args = [ffmpeg.executable, '-y', '-nostdin', '-hide_banner', '-loglevel', 'error', '-xerror']
+        for read_fd, _ in pipes:
+            args += ['-i', f'pipe:{read_fd}']
+        args += self.output_args(info_dict, formats, attachments) + [tmpfilename]
+        self._debug_cmd(args)
+
+        try:
+            process = subprocess.Popen(
+                args, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                pass_fds=[read_fd for read_fd, _ in pipes])
+        except OSError:
+            for fds in pipes:
+                for fd in fds:
+                    os.close(fd)
+            raise
+        for read_fd, _ in pipes:
+            os.close(read_fd)  # ffmpeg has its own copies
+
+        stderr = collections.deque(maxlen=STDERR_LINES)
+        reader = threading.Thread(target=self.read_stderr, args=(process, stderr), daemon=True)
+        reader.start()
+        sources = [functools.partial(self.stream_format, transfer, index) for index in range(len(formats))]
+        sources += [functools.partial(self.write_attachment, data) for data in attachments]
+        feeders = [threading.Thread(target=self.feed, args=(transfer, source, write_fd, process),
+                                    daemon=True)
+                   for source, (_, write_fd) in zip(sources, pipes)]
+        for feeder in feeders:
+            feeder.start()
+        for feeder in feeders:
+            feeder.join()
+        returncode = process.wait()
+        reader.join()
+
+        if transfer.error is not None:
+            self.try_remove(tmpfilename)
+            raise transfer.error
+        if returncode != 0 or transfer.broken_pipe:
+            self.try_remove(tmpfilename)
+            raise self.ffmpeg_error(stderr[-1] if stderr else f'exit code {returncode}')
+
+        self.try_rename(tmpfilename, filename)
+        size = os.path.getsize(filename)
+        self._hook_progress({
+            'downloaded_bytes': size,
+            'total_bytes': size,
+            'filename': filename,
+            'status': 'finished',
+            'elapsed': time.time() - transfer.start,
+        }, info_dict)
+        return True
+
+    def input_formats(self, info_dict):
+        """Formats streamed into ffmpeg, its first inputs in this order"""
+        return info_dict['requested_formats']
+
+    def attachments(self, info_dict):
+        """Data ffmpeg reads as further inputs after the formats, e.g. a cover image"""
+        return []
+
+    def output_args(self, info_dict, formats, attachments):
+        """ffmpeg arguments between the inputs and the output file"""
+        args = []
+        for index, f in enumerate(formats):
+            args += ['-map', f'{index}:v:0' if f.get('vcodec') != 'none' else f'{index}:a:0']
+        ext = info_dict['ext']
+        return args + ['-c', 'copy', '-f', EXT_TO_OUT_FORMATS.get(ext, ext)]
+
+    def ffmpeg_error(self, detail):
+        return StreamMergeError(f'ffmpeg could not merge the streams: {detail}')
+
+    def read_stderr(self, process, lines):
+        for line in process.stderr:
+            lines.append(line.decode('utf-8', 'replace').strip())
+        process.stderr.close()
+
+    def feed(self, transfer, source, write_fd, process):
+        """One input: write `source` into its pipe, front to back"""
+        try:
+            with open(write_fd, 'wb', buffering=0) as pipe:
+                source(pipe)
+        except BrokenPipeError:
+            # ffmpeg stopped reading, its exit code says why
+            transfer.broken_pipe = True
+        except Exception as e:
+            # Cancellation raised by a progress hook ends up here as well
+            transfer.fail(e)
+            # ffmpeg would wait for the rest of this input, and the others for ffmpeg
+            process.kill()
+
+    def write_attachment(self, data, pipe):
+        try:
+            pipe.write(data)
+        except BrokenPipeError:
+            pass  # ffmpeg may stop reading once it has the one frame it needs
+
+    def stream_format(self, transfer, index, pipe):
+        fmt = transfer.formats[index]
+        headers = HTTPHeaderDict({'Accept-Encoding': 'identity'}, fmt.get('http_headers'))
+        retries = self.params.get('retries', 10)
+        chunk_size = self.params.get('http_chunk_size') or \
+            fmt.get('downloader_options', {}).get('http_chunk_size') or 0
+        position = 0
+        total = None
+        count = 0
+        while total is None or position < total:
+            if transfer.error is not None:
+                return
+            # Servers that throttle long responses are asked for chunk_size pieces
+            byte_range = f'bytes={position}-{position + chunk_size - 1 if chunk_size else ""}'
+            request_headers = headers if not position and not chunk_size else \
+                {**headers, 'Range': byte_range}
+            try:
+                response = self.ydl.urlopen(Request(fmt['url'], headers=request_headers))
+                try:
+                    if 'Range' in request_headers:
+                        content_range = response.headers.get('Content-Range') or ''
+                        if response.status != 206 or not content_range.startswith(f'bytes {position}-'):
+                            raise StreamMergeError(f'Server ignored the range at byte {position}')
+                        total = int_or_none(content_range.rpartition('/')[2]) or total
+                    else:
+                        total = int_or_none(response.headers.get('Content-Length'))
+                    if total is not None:
+                        transfer.totals[index] = total
+                    received = 0
+                    while True:
+                        data = response.read(READ_SIZE)
+                        if not data:
+                            break
+                        pipe.write(data)
+                        position += len(data)
+                        received += len(data)
+                        self.report_bytes(transfer, index, position)
+                        count = 0
+                finally:
+                    response.close()
+                if total is None:
+                    break  # Unknown length, the server closing the connection is the end
+                if not received and position < total:
+                    raise TransportError(f'Connection closed at byte {position}')
+            except (HTTPError, TransportError) as e:
+                if isinstance(e, HTTPError) and not 500 <= e.status < 600:
+                    raise
+                count += 1
+                if count > retries:
+                    raise
+                # Counted by DownloadLogger like yt-dlp's own retries
+                self.to_screen(f'[download] Got error: {e}. Retrying stream {fmt["format_id"]} '
+                               f'at byte {position} ({count}/{retries})...')
+                time.sleep(min(count, 5))
+        self.report_bytes(transfer, index, position, last=True)
+
+    def report_bytes(self, transfer, index, position, last=False):
+        with transfer.progress_lock:
+            transfer.downloaded[index] = position
+        # Progress hooks may block, e.g. in the bandwidth limiter. The other
+        # stream skips its reports meanwhile instead of waiting, the next
+        # report includes its bytes. Only the last report of a stream waits
+        # its turn, nothing would report its final bytes otherwise.
+        if not transfer.hook_lock.acquire(blocking=last):
+            return
+        try:
+            # Both streams count as one download, the size of the merged file
+            # being about the sum of theirs
+            with transfer.progress_lock:
+                downloaded = sum(transfer.downloaded)
+            total = sum(transfer.totals) if all(transfer.totals) else None
+            elapsed = time.time() - transfer.start
+            speed = downloaded / elapsed if elapsed > 0 else None
+            self._hook_progress({
+                'status': 'downloading',
+                'downloaded_bytes': downloaded,
+                'total_bytes': total,
+                'tmpfilename': transfer.tmpfilename,
+                'filename': transfer.filename,
+                'elapsed': elapsed,
+                'speed': speed,
+                'eta': (total - downloaded) / speed if speed and total else None,
+            }, transfer.info_dict)
+        finally:
+            transfer.hook_lock.release()
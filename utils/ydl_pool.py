@@ -0,0 +1,158 @@
+import threading
+import time
+from contextlib import contextmanager
+from utils.ytdlp_loader import load_extractors
+
+# Idle instances kept per option set
+MAX_IDLE = 4
+# Seconds an idle instance may wait for its next job before it is closed
+IDLE_TIMEOUT = 10 * 60
+# Options that differ between jobs. They are swapped on checkout instead of
+# being part of the pool key.
+PER_JOB_OPTIONS = ('format', 'progress_hooks', 'logger', 'concurrent_fragment_downloads',
+                   'fragment_buffer_size', 'stream_merge', 'audio_transcode')
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class _HookRelay:
+    """The only progress hook a pooled instance has, forwards to the current job's hooks"""
+    def __init__(self):
+        self.hooks = []
+
+    def __call__(self, d):
+        for hook in self.hooks:
+            hook(d)
+
+
+class _PoolEntry:
+    def __init__(self, ydl_opts):
+        # yt-dlp takes a while to import, keep it out of application startup.
+        # Imported through load_extractors, whose lock keeps the startup
+        # warm-up and the first job from importing it at the same time.
+        load_extractors()
+        from utils.downloaders import PooledYoutubeDL
+
+        self.relay = _HookRelay()
+        params = {k: v for k, v in ydl_opts.items() if k != 'progress_hooks'}
+        params['progress_hooks'] = [self.relay]
+        self.relay.hooks = list(ydl_opts.get('progress_hooks') or [])
+        self.ydl = PooledYoutubeDL(params)
+        self.returned_at = 0.0
+
+
+class YDLPool:
+    """
+    Reusable YoutubeDL instances, keyed by their options minus the per-job
+    ones. Building an instance sets up extractors, the cookie jar and the
+    request handlers, and a reused one keeps its extractor state (e.g.
+    downloaded player code) and its HTTP sessions between jobs.
+
+    An instance is only ever used by one job at a time, like the yt-dlp
+    command line using one instance for every URL it is given.
+    """
+    def __init__(self, max_idle=MAX_IDLE, idle_timeout=IDLE_TIMEOUT):
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self.lock = threading.Lock()
+        self.idle = {}  # option key -> [_PoolEntry], most recently returned last
+        self.warming = {}  # option key -> Event set once warm() has built its instance
+
+    @staticmethod
+    def options_key(ydl_opts):
+        return repr(sorted((k, v) for k, v in ydl_opts.items() if k not in PER_JOB_OPTIONS))
+
+    @contextmanager
+    def checkout(self, ydl_opts):
+        """Use a YoutubeDL configured with `ydl_opts` for the duration of the block"""
+        key = self.options_key(ydl_opts)
+        with self.lock:
+            warming = self.warming.get(key)
+        if warming:
+            # Building a second instance in parallel would only slow both down
+            warming.wait()
+        with self.lock:
+            entries = self.idle.get(key)
+            entry = entries.pop() if entries else None
+        if entry is None:
+            entry = _PoolEntry(ydl_opts)
+        else:
+            self._prepare(entry, ydl_opts)
+
+        try:
+            yield entry.ydl
+        finally:
+            self._release(key, entry)
+
+    def warm(self, ydl_opts):
+        """Build an instance for `ydl_opts` ahead of the first checkout"""
+        key = self.options_key(ydl_opts)
+        with self.lock:
+            if self.idle.get(key) or key in self.warming:
+                return
+            warming = self.warming[key] = threading.Event()
+        try:
+            entry = _PoolEntry(ydl_opts)
+            entry.returned_at = time.monotonic()
+            with self.lock:
+                self.idle.setdefault(key, []).append(entry)
+        finally:
+            with self.lock:
+                del self.warming[key]
+            warming.set()
+
+    def _prepare(self, entry, ydl_opts):
+        ydl = entry.ydl
+        for option in PER_JOB_OPTIONS:
+            if option == 'progress_hooks':
+                continue
+            if option in ydl_opts:
+                ydl.params[option] = ydl_opts[option]
+            else:
+                ydl.params.pop(option, None)
+        # YoutubeDL parses the format once, when it is created
+        fmt = ydl.params.get('format')
+        ydl.format_selector = fmt if fmt in (None, '-') or callable(fmt) \
+            else ydl.build_format_selector(fmt)
+        entry.relay.hooks = list(ydl_opts.get('progress_hooks') or [])
+
+    def _release(self, key, entry):
+        # Let go of the job's objects until the next checkout
+        entry.relay.hooks = []
+        entry.ydl.params.pop('logger', None)
+        entry.returned_at = time.monotonic()
+
+        expired = []
+        with self.lock:
+            entries = self.idle.setdefault(key, [])
+            entries.append(entry)
+            for entries in self.idle.values():
+                while entries and (len(entries) > self.max_idle or
+                                   entry.returned_at - entries[0].returned_at > self.idle_timeout):
+                    expired.append(entries.pop(0))
+        for old in expired:
+            old.ydl.close()
+
+    def close(self):
+        with self.lock:
+            entries = [entry for entries in self.idle.values() for entry in entries]
+            self.idle = {}
+        for entry in entries:
+            entry.ydl.close()
+
+
+def get_ydl_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = YDLPool()
+        return _pool
+
+
+def shutdown_ydl_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
@@ -0,0 +1,19 @@
+import threading
+
+_extractor_classes = None
+_extractor_lock = threading.Lock()
+
+
+def load_extractors():
+    """
+    yt-dlp's extractor classes, imported on first use. Importing yt-dlp
+    from two threads at once can fail with a partially initialized
+    module, so code that may run alongside the startup warm-up imports it
+    through here.
+    """
+    global _extractor_classes
+    with _extractor_lock:
+        if _extractor_classes is None:
+            from yt_dlp.extractor import gen_extractor_classes
+            _extractor_classes = gen_extractor_classes()
+    return _extractor_classes